@@ -71,9 +71,12 @@ class BaseChatProvider(ABC):
         """
         pass
 
-    async def fetch_historic_messages(self, identifier: str, limit: int = 500, skip_media_download: bool = False) -> List[Dict]:
+    async def fetch_historic_messages(self, identifier: str, limit: int = 500, skip_media_download: bool = False,
+                                      since_ts_ms: Optional[int] = None, until_ts_ms: Optional[int] = None) -> List[Dict]:
         """
         Fetches historic messages for a given identifier (group or user).
+        since_ts_ms (exclusive) / until_ts_ms (inclusive) are a pre-filter hint: providers that
+        support it only return messages in that range, callers must still filter themselves.
         Default implementation returns empty list.
         """
         return []
@@ -84,3 +87,10 @@ class BaseChatProvider(ABC):
         Default implementation returns False.
         """
         return False
+
+    def are_bot_messages(self, message_ids: List[str]) -> List[bool]:
+        """
+        Batched is_bot_message: one flag per given ID, in order.
+        Default implementation checks each ID.
+        """
+        return [self.is_bot_message(message_id) for message_id in message_ids]
@@ -114,6 +114,11 @@ class WhatsAppBaileysProvider(BaseChatProvider):
         # console_log(f"DEBUG_BOT: No match found in cache for ID: {provider_message_id}")
         return False
 
+    def are_bot_messages(self, provider_message_ids: List[str]) -> List[bool]:
+        # One pass over the sent-ID cache instead of one scan per message
+        sent_ids = {msg_id for msg_id, _ in self.sent_message_ids}
+        return [bool(provider_message_id) and provider_message_id in sent_ids for provider_message_id in provider_message_ids]
+
     def _check_and_consume_pending(self, recipient_id: str, content: str) -> bool:
         """
         Checks if a message matches a pending bot message by content and recipient.
@@ -577,9 +582,15 @@ class WhatsAppBaileysProvider(BaseChatProvider):
             logging.error(f"Exception while fetching active groups: {e}")
             return []
 
-    async def fetch_historic_messages(self, group_id: str, limit: int = 500, skip_media_download: bool = False) -> Optional[List]:
+    async def fetch_historic_messages(self, group_id: str, limit: int = 500, skip_media_download: bool = False,
+                                      since_ts_ms: Optional[int] = None, until_ts_ms: Optional[int] = None) -> Optional[List]:
         try:
             payload = {"groupId": group_id, "limit": limit, "skipMediaDownload": skip_media_download}
+            # Let the server drop out-of-window messages before processing them
+            if since_ts_ms is not None:
+                payload["sinceTs"] = since_ts_ms
+            if until_ts_ms is not None:
+                payload["untilTs"] = until_ts_ms
             async with httpx.AsyncClient() as client:
                 response = await client.post(
                     f"{self.base_url}/sessions/{self.bot_id}/fetch-messages",
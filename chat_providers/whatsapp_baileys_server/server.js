@@ -1797,7 +1797,7 @@ app.post('/sessions/:userId/groups', async (req, res) => {
 
 app.post('/sessions/:userId/fetch-messages', async (req, res) => {
     const { userId } = req.params;
-    const { groupId, limit, skipMediaDownload } = req.body;
+    const { groupId, limit, skipMediaDownload, sinceTs, untilTs } = req.body;
     const session = sessions[userId];
     if (!session || !session.sock) {
         return res.status(404).json({ error: 'Session not found.' });
@@ -1807,7 +1807,17 @@ app.post('/sessions/:userId/fetch-messages', async (req, res) => {
     }
 
     try {
-        console.log(`[${userId}] Fetching ${limit} historic messages for ${groupId} (skipMediaDownload: ${skipMediaDownload})...`);
+        console.log(`[${userId}] Fetching ${limit} historic messages for ${groupId} (skipMediaDownload: ${skipMediaDownload}, sinceTs: ${sinceTs}, untilTs: ${untilTs})...`);
+
+        // Optional window (sinceTs exclusive, untilTs inclusive, ms). Messages without a timestamp are kept
+        // and left for the caller to filter.
+        const isInWindow = (msg) => {
+            if (!msg.messageTimestamp) return true;
+            const ts = (typeof msg.messageTimestamp === 'number' ? msg.messageTimestamp : msg.messageTimestamp.toNumber()) * 1000;
+            if (sinceTs != null && ts <= sinceTs) return false;
+            if (untilTs != null && ts > untilTs) return false;
+            return true;
+        };
 
         let messages = [];
 
@@ -1817,13 +1827,13 @@ app.post('/sessions/:userId/fetch-messages', async (req, res) => {
             // We want the last 'limit' messages.
             // We can pass `undefined` for cursor to get latest.
             const result = await session.sock.fetchMessagesFromWA(groupId, limit);
-            messages = result || [];
+            messages = (result || []).filter(isInWindow);
         } else if (session.store && session.store.messages[groupId]) {
             // Use local store buffer (active provider state)
             const storedMessages = session.store.messages[groupId];
             // console.log(`[${userId}] Using local store buffer for ${groupId}. Found ${storedMessages.length} total messages.`);
-            // Get last 'limit' messages
-            messages = storedMessages.slice(-limit);
+            // Get last 'limit' messages within the requested window
+            messages = storedMessages.filter(isInWindow).slice(-limit);
         } else {
             console.warn(`[${userId}] Active fetch failed and no local store data for ${groupId}.`);
 
@@ -11,6 +11,14 @@ if TYPE_CHECKING:
     from services.bot_lifecycle_service import BotLifecycleService
     from gateway.session_manager import SessionManager
 
+# Backend Mongo connection pool. Cron ticks fan out many concurrent tracking jobs,
+# so keep a few warm connections and fail fast instead of queueing forever when saturated.
+MONGO_MAX_POOL_SIZE = 50
+MONGO_MIN_POOL_SIZE = 5
+MONGO_WAIT_QUEUE_TIMEOUT_MS = 5000
+# Wire compression (zstandard is in requirements); tracked period reads carry large message arrays
+MONGO_COMPRESSORS = "zstd"
+
 class GlobalStateManager:
     _instance = None
 
@@ -55,7 +63,14 @@ class GlobalStateManager:
 
     async def initialize_mongodb(self, mongodb_url: str):
         logging.info(f"API: Connecting to MongoDB at {mongodb_url}")
-        self.mongo_client = AsyncIOMotorClient(mongodb_url, serverSelectionTimeoutMS=5000)
+        self.mongo_client = AsyncIOMotorClient(
+            mongodb_url,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+            compressors=MONGO_COMPRESSORS
+        )
         # Force connection check
         await self.mongo_client.admin.command('ismaster')
         
@@ -85,7 +100,7 @@ class GlobalStateManager:
         self.token_consumption_collection = self.db.get_collection(db_schema.COLLECTION_TOKEN_CONSUMPTION)
 
         # Ensure indexes (Centralized)
-        await db_schema.create_indexes(self.db)
+        await db_schema.create_indexes(self.db, warmup_connections=MONGO_MIN_POOL_SIZE)
 
         logging.info("API: Successfully connected to MongoDB.")
 
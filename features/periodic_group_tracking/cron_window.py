@@ -1,11 +1,40 @@
+import copy
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 from croniter import croniter
 from zoneinfo import ZoneInfo
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Dict
 
 logger = logging.getLogger(__name__)
 
+# DST transitions are months apart, so within this gap an unchanged UTC offset means no transition
+DST_SAFE_MAX_GAP = timedelta(days=7)
+
+class CachedCroniter(croniter):
+    """
+    croniter that parses each cron expression only once.
+    Every croniter(...) / croniter.match(...) call re-runs the regex-heavy expansion;
+    here the expanded fields are memoized per expression and each instance gets its own copy.
+    Overrides croniter's private _expand, so croniter is pinned in requirements.txt;
+    test_cached_croniter_override_is_used fails if a croniter upgrade stops calling it.
+    """
+    _expand_cache: Dict[tuple, tuple] = {}
+
+    @classmethod
+    def _expand(cls, expr_format, hash_id=None, second_at_beginning=False, from_timestamp=None, **kwargs):
+        # Expansion relative to a start time (or with extra options) is not reusable
+        if from_timestamp is not None or kwargs:
+            return super()._expand(expr_format, hash_id=hash_id, second_at_beginning=second_at_beginning,
+                                   from_timestamp=from_timestamp, **kwargs)
+
+        key = (expr_format, hash_id, second_at_beginning)
+        cached = cls._expand_cache.get(key)
+        if cached is None:
+            cached = super()._expand(expr_format, hash_id=hash_id, second_at_beginning=second_at_beginning)
+            cls._expand_cache[key] = cached
+        # croniter mutates the nth-weekday sets in place while iterating
+        return copy.deepcopy(cached)
+
 class CronWindowCalculator:
     """
     Service to calculate the time window for a scheduled job based on a cron expression.
@@ -101,21 +130,26 @@ class CronWindowCalculator:
         """
         try:
             # A. Try Standard Backward
-            iter_back = croniter(cron_expression, from_dt)
+            iter_back = CachedCroniter(cron_expression, from_dt)
             candidate_prev = iter_back.get_prev(datetime)
             
             # Safety: Ensure we actually went back in time (DST quirks)
             while candidate_prev >= from_dt:
                 logger.warning(f"Croniter returned future/present time {candidate_prev}. Retrying.")
                 candidate_prev = iter_back.get_prev(datetime)
+
+            # Fast path: no UTC offset change between the candidate and from_dt (and the gap is too short
+            # to hide two transitions) -> no DST transition in between, croniter's answer is exact.
+            if (from_dt - candidate_prev) < DST_SAFE_MAX_GAP and candidate_prev.utcoffset() == from_dt.utcoffset():
+                return candidate_prev
             
-            if croniter.match(cron_expression, candidate_prev):
+            if CachedCroniter.match(cron_expression, candidate_prev):
                 # Wiggle Check: If skipped due to DST fallback "phantom hour" logic in croniter
-                iter_fwd_check = croniter(cron_expression, candidate_prev)
+                iter_fwd_check = CachedCroniter(cron_expression, candidate_prev)
                 intermediate = iter_fwd_check.get_next(datetime)
                 
                 # If intermediate is valid AND effectively 'next' from candidate but 'prev' from from_dt
-                if intermediate < from_dt and croniter.match(cron_expression, intermediate):
+                if intermediate < from_dt and CachedCroniter.match(cron_expression, intermediate):
                         # Found a hidden occurrence
                         return intermediate
                 
@@ -125,7 +159,7 @@ class CronWindowCalculator:
                      other_fold = candidate_prev.replace(fold=1)
                      # Check if it is actually ambiguous (offsets differ)
                      if other_fold.utcoffset() != candidate_prev.utcoffset():
-                         match = croniter.match(cron_expression, other_fold)
+                         match = CachedCroniter.match(cron_expression, other_fold)
                          # Explicitly compare timestamps for safety (handle fold comparison quirks)
                          cond1 = other_fold.timestamp() < from_dt.timestamp()
                          cond2 = other_fold.timestamp() > candidate_prev.timestamp()
@@ -137,16 +171,16 @@ class CronWindowCalculator:
                         
             else: 
                     # Candidate is invalid. Wiggle forward from it.
-                    iter_wiggle = croniter(cron_expression, candidate_prev)
+                    iter_wiggle = CachedCroniter(cron_expression, candidate_prev)
                     wiggle_candidate = iter_wiggle.get_next(datetime)
                     
-                    if wiggle_candidate < from_dt and croniter.match(cron_expression, wiggle_candidate):
+                    if wiggle_candidate < from_dt and CachedCroniter.match(cron_expression, wiggle_candidate):
                         return wiggle_candidate
                     else:
                         # Keep going back until valid (Safety loop)
                         for _ in range(5):
                             candidate_prev = iter_back.get_prev(datetime)
-                            if croniter.match(cron_expression, candidate_prev):
+                            if CachedCroniter.match(cron_expression, candidate_prev):
                                 return candidate_prev
                         return None
         except Exception as e:
@@ -1,23 +1,114 @@
+import asyncio
 import json
-import importlib
-import inspect
+import random
+import re
 import logging
+import orjson
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from pathlib import Path
+from typing import Optional, Dict, Tuple, Any
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+import httpx
 
-from config_models import ChatCompletionProviderConfig
-from model_providers.base import BaseModelProvider
 from resources import get_language_name
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+# The system prompt is kept free of per-bot variables so it stays byte-identical
+# across calls and can be served from the provider's prompt prefix cache.
+# Everything that varies (output language, messages) goes into the human message.
+HUMAN_PROMPT_TEMPLATE = "Output language: language_code='{language_code}' ({language_name})\nMessages:\n{input}"
+
+# Windows where every human message is only acknowledgement tokens, emojis or stickers are not worth
+# an LLM call. Any other word keeps the window, so single-word updates like "Cancelled!" and scripts
+# without spaces between words (CJK, Thai) still reach the LLM.
+ACKNOWLEDGEMENT_TOKENS = frozenset({
+    "ok", "okay", "k", "kk", "lol", "haha", "hahaha", "hehe", "yes", "yep", "yeah", "sure", "cool",
+    "nice", "great", "thanks", "thx", "ty", "thank", "you", "np", "hi", "hey", "hello", "bye",
+    "אוקיי", "אוקי", "סבבה", "תודה", "חחח", "חחחח", "כן", "אחלה", "יופי",
+})
+_WORD_RE = re.compile(r"[^\W\d_]+", re.UNICODE)
+
+# Transient provider failures (throttling, 5xx, network/timeouts) are retried with exponential backoff,
+# so a throttled tick does not lose the period's items. Errors are classified by HTTP status and transport
+# error, not by SDK exception types, so any provider gets the same policy. The LLM slot is released while
+# backing off; a Retry-After longer than the cap is still not waited out.
+LLM_MAX_ATTEMPTS = 4
+LLM_RETRY_MAX_DELAY_SECONDS = 30
+RETRYABLE_LLM_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504})
+
+def _is_retryable_llm_error(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    status_code = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status_code is not None:
+        return status_code in RETRYABLE_LLM_STATUS_CODES
+    # SDK connection/timeout errors carry no status and wrap the underlying transport error
+    return isinstance(error.__cause__, (httpx.TransportError, ConnectionError))
+
+def _retry_after_seconds(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+EXTRACTOR_PROMPT_PATH = Path("prompts/action_item_extractor_system.txt")
+REFINEMENT_PROMPT_PATH = Path("prompts/action_item_refinement_system.txt")
+
+# Stage 2 template is static - the formatted system prompt and the stage 1 result are both variables
+REFINE_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", "{system_content}"),
+    ("user", "{input_content}")
+])
+
 class ActionItemExtractor:
     def __init__(self):
-        pass
+        # Prompt files are read once, templates/chains built once and reused across runs
+        self._prompt_texts: Dict[Path, str] = {}
+        self._extraction_prompt: Optional[ChatPromptTemplate] = None
+        # (bot_id, config_tier) -> (llm, chain); rebuilt when the model factory hands out a new llm
+        self._chains: Dict[Tuple[str, str], Tuple[Any, Any]] = {}
+
+    def _read_prompt(self, path: Path) -> str:
+        text = self._prompt_texts.get(path)
+        if text is None:
+            text = path.read_text(encoding="utf-8")
+            self._prompt_texts[path] = text
+        return text
+
+    async def _ainvoke_with_retry(self, chain, inputs: Dict[str, Any], bot_id: str, stage: str,
+                                  llm_slots: Optional[asyncio.Semaphore] = None) -> str:
+        for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+            try:
+                # A slot is held per call only, so a backing-off extraction does not block other groups
+                if llm_slots is None:
+                    return await chain.ainvoke(inputs)
+                async with llm_slots:
+                    return await chain.ainvoke(inputs)
+            except Exception as e:
+                if attempt == LLM_MAX_ATTEMPTS or not _is_retryable_llm_error(e):
+                    raise
+                delay = _retry_after_seconds(e)
+                if delay is not None and delay > LLM_RETRY_MAX_DELAY_SECONDS:
+                    logger.warning(f"LLM ({stage}) call failed for bot {bot_id}: {e}. Retry-After {delay:.0f}s exceeds {LLM_RETRY_MAX_DELAY_SECONDS}s, giving up.")
+                    raise
+                if delay is None:
+                    delay = min(LLM_RETRY_MAX_DELAY_SECONDS, 2 ** (attempt - 1)) + random.uniform(0, 1)
+                logger.warning(f"LLM ({stage}) call failed for bot {bot_id}: {e}. Retrying in {delay:.1f}s ({attempt}/{LLM_MAX_ATTEMPTS})")
+                await asyncio.sleep(delay)
+
+    def _get_chain(self, bot_id: str, config_tier: str, prompt: ChatPromptTemplate, llm) -> Any:
+        cached = self._chains.get((bot_id, config_tier))
+        if cached and cached[0] is llm:
+            return cached[1]
+        chain = prompt | llm | StrOutputParser()
+        self._chains[(bot_id, config_tier)] = (llm, chain)
+        return chain
 
     def _build_llm_input_json(self, messages: list, timezone: ZoneInfo) -> str:
         """
@@ -25,16 +116,39 @@ class ActionItemExtractor:
         Each message has: when (timestamp in user's timezone), sender (display name), content.
         """
         formatted_messages = []
+        # "when" has minute precision, so format each distinct minute only once
+        # (chat messages cluster heavily, this skips most tz conversions)
+        when_by_minute = {}
         for msg in messages:
-            originating_time_ms = msg.get('originating_time', 0)
-            originating_dt = datetime.fromtimestamp(originating_time_ms / 1000, tz=timezone)
+            originating_minute = msg.get('originating_time', 0) // 60000
+            when = when_by_minute.get(originating_minute)
+            if when is None:
+                when = datetime.fromtimestamp(originating_minute * 60, tz=timezone).strftime('%Y-%m-%d %H:%M')
+                when_by_minute[originating_minute] = when
             formatted_msg = {
-                "when": originating_dt.strftime('%Y-%m-%d %H:%M'),
+                "when": when,
                 "sender": msg.get('sender', {}).get('display_name', 'Unknown'),
                 "content": msg.get('message', '')
             }
             formatted_messages.append(formatted_msg)
-        return json.dumps(formatted_messages, indent=2, ensure_ascii=False)
+        # Compact (no indent) - whitespace only costs input tokens; orjson emits raw UTF-8 like ensure_ascii=False
+        return orjson.dumps(formatted_messages).decode("utf-8")
+
+    def _is_low_signal(self, messages: list) -> bool:
+        """
+        Cheap, language-agnostic pre-check before the LLM.
+        Ignores bot messages; any digit counts as a possible time/date and keeps the window.
+        Only windows of bare acknowledgements, emojis and stickers are skipped.
+        """
+        for msg in messages:
+            if (msg.get('sender', {}).get('identifier') or '').startswith('bot_'):
+                continue
+            content = msg.get('message') or ''
+            if any(ch.isdigit() for ch in content):
+                return False
+            if any(word not in ACKNOWLEDGEMENT_TOKENS for word in _WORD_RE.findall(content.lower())):
+                return False
+        return True
 
     def _parse_llm_json(self, json_str: str) -> list:
         """
@@ -63,7 +177,8 @@ class ActionItemExtractor:
             logger.error(f"Failed to parse LLM JSON: {e}. Raw: {json_str[:200]}...")
             return []
 
-    async def extract(self, messages: list, bot_id: str, timezone: ZoneInfo, group_id: str = "", language_code: str = "en") -> list:
+    async def extract(self, messages: list, bot_id: str, timezone: ZoneInfo, group_id: str = "", language_code: str = "en",
+                      llm_slots: Optional[asyncio.Semaphore] = None) -> list:
         """
         Main entry point. Uses LLM to extract action items from group messages.
         
@@ -73,11 +188,16 @@ class ActionItemExtractor:
             timezone: User's timezone
             group_id: Group identifier for recording purposes
             language_code: ISO 639-1 language code for response language
+            llm_slots: Optional semaphore bounding concurrent LLM calls, held for each call only
             
         Returns:
             List of action item dicts.
         """
         from model_providers.recorder import LLMRecorder
+
+        if self._is_low_signal(messages):
+            logger.info(f"Skipping LLM for bot {bot_id}, group {group_id}: {len(messages)} messages with no actionable content.")
+            return []
         
         # Build Input JSON
         messages_json = self._build_llm_input_json(messages, timezone)
@@ -85,12 +205,11 @@ class ActionItemExtractor:
 
         # System prompt with language placeholder - loaded from external file
         try:
-            prompt_path = Path("prompts/action_item_extractor_system.txt")
-            if not prompt_path.exists():
-                logger.error(f"Prompt file not found: {prompt_path.absolute()}")
+            if EXTRACTOR_PROMPT_PATH not in self._prompt_texts and not EXTRACTOR_PROMPT_PATH.exists():
+                logger.error(f"Prompt file not found: {EXTRACTOR_PROMPT_PATH.absolute()}")
                 return []
             
-            system_prompt_template = prompt_path.read_text(encoding="utf-8")
+            system_prompt_template = self._read_prompt(EXTRACTOR_PROMPT_PATH)
         except Exception as e:
             logger.error(f"Failed to read prompt file: {e}")
             return []
@@ -106,8 +225,8 @@ class ActionItemExtractor:
                 recorder = LLMRecorder(bot_id, "periodic_group_tracking", group_id)
                 epoch_ts = recorder.start_recording()
                 language_name = get_language_name(language_code)
-                formatted_prompt = system_prompt_template.replace("{language_name}", language_name)
-                recorder.record_prompt(formatted_prompt, messages_json, epoch_ts=epoch_ts)
+                human_content = HUMAN_PROMPT_TEMPLATE.format(input=messages_json, language_code=language_code, language_name=language_name)
+                recorder.record_prompt(system_prompt_template, human_content, epoch_ts=epoch_ts)
                 config_dict = config_low.provider_config.model_dump()
                 config_dict['provider_name'] = config_low.provider_name
                 config_dict['language_code'] = language_code
@@ -125,29 +244,37 @@ class ActionItemExtractor:
                 config_tier="low"
             )
             
-            # Create the prompt and chain - language_code passed as template variable
-            prompt = ChatPromptTemplate.from_messages([
-                ("system", system_prompt_template),
-                ("human", "{input}")
-            ])
+            # Create the prompt and chain - static system prompt first (cacheable prefix),
+            # language_code passed as a template variable of the human message
+            if self._extraction_prompt is None:
+                self._extraction_prompt = ChatPromptTemplate.from_messages([
+                    ("system", system_prompt_template),
+                    ("human", HUMAN_PROMPT_TEMPLATE)
+                ])
+            prompt = self._extraction_prompt
             
-            chain = prompt | llm | StrOutputParser()
+            chain = self._get_chain(bot_id, "low", prompt, llm)
             
-            # Inspect and log the actual formatted messages
+            # Inspect and log the actual formatted messages (debug only, the chain formats them again)
             language_name = get_language_name(language_code)
-            formatted_messages = await prompt.aformat_messages(input=messages_json, language_code=language_code, language_name=language_name)
-            print(f"--- LLM PROMPT DEBUG ---")
-            print(f"System Message Content: {formatted_messages[0].content}")
-            print(f"Human Message Content: {formatted_messages[1].content}")
-            print(f"------------------------")
+            if logger.isEnabledFor(logging.DEBUG):
+                formatted_messages = await prompt.aformat_messages(input=messages_json, language_code=language_code, language_name=language_name)
+                logger.debug(f"LLM prompt system message for bot {bot_id}: {formatted_messages[0].content}")
+                logger.debug(f"LLM prompt human message for bot {bot_id}: {formatted_messages[1].content}")
 
             # Invoke the chain with all template variables
             # PHASE 1: Low Model Extraction
             # Invoke the chain with all template variables
             # Invoke the chain with all template variables
             logger.info(f"Invoking LLM (Low) for action items extraction for bot {bot_id}")
-            result_low = await chain.ainvoke({"input": messages_json, "language_code": language_code, "language_name": language_name})
-            print(f"--- LLM RESULT (LOW) DEBUG ---\n{result_low}\n-----------------------")
+            result_low = await self._ainvoke_with_retry(
+                chain,
+                {"input": messages_json, "language_code": language_code, "language_name": language_name},
+                bot_id,
+                "Low",
+                llm_slots
+            )
+            logger.debug(f"LLM result (Low) for bot {bot_id}: {result_low}")
             
             # Sanitize LLM common error (escaped single quotes are invalid JSON)
             if isinstance(result_low, str):
@@ -157,9 +284,8 @@ class ActionItemExtractor:
             logger.info(f"Invoking LLM (High) for refinement for bot {bot_id}")
             try:
                 # 1. Load System Prompt
-                refine_prompt_path = Path("prompts/action_item_refinement_system.txt")
-                if refine_prompt_path.exists():
-                    refine_system_prompt = refine_prompt_path.read_text(encoding="utf-8")
+                if REFINEMENT_PROMPT_PATH in self._prompt_texts or REFINEMENT_PROMPT_PATH.exists():
+                    refine_system_prompt = self._read_prompt(REFINEMENT_PROMPT_PATH)
                 else:
                     logger.warning("Refinement prompt file not found, skipping Stage 2.")
                     refine_system_prompt = ""
@@ -173,11 +299,7 @@ class ActionItemExtractor:
 
                 # 3. Create Chain
                 # We pass the result_low as the USER message. System prompt is the file content.
-                refine_prompt = ChatPromptTemplate.from_messages([
-                    ("system", "{system_content}"),
-                    ("user", "{input_content}")
-                ])
-                refine_chain = refine_prompt | high_llm | StrOutputParser()
+                refine_chain = self._get_chain(bot_id, "high", REFINE_PROMPT, high_llm)
                 
                 # Format system prompt with language_code and language_name if present
                 try:
@@ -190,12 +312,12 @@ class ActionItemExtractor:
                     formatted_system_prompt = refine_system_prompt
 
                 # 4. Invoke
-                result_high = await refine_chain.ainvoke({
+                result_high = await self._ainvoke_with_retry(refine_chain, {
                     "system_content": formatted_system_prompt,
                     "input_content": result_low
-                })
+                }, bot_id, "High", llm_slots)
 
-                print(f"--- LLM RESULT (HIGH) DEBUG ---\n{result_high}\n-----------------------")
+                logger.debug(f"LLM result (High) for bot {bot_id}: {result_high}")
                 
                 # Sanitize
                 if isinstance(result_high, str):
@@ -1,20 +1,61 @@
 
+import asyncio
 import logging
-from datetime import datetime
-from typing import List, Optional, Dict, Any
+import orjson
+import zstandard
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, AsyncIterator
+from bson.binary import Binary
+from bson.codec_options import CodecOptions
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from infrastructure import db_schema
 
 logger = logging.getLogger(__name__)
 
+# How long a tracking result waits for other groups of the same bot before the batch is written
+PERIOD_WRITE_FLUSH_DELAY_SECONDS = 1.0
+
+# Most recent periods per group read by deduplication (get_recent_message_ids); these keep a plain
+# messages array, older periods store it zstd-compressed in 'messages_zstd' (messages: None)
+RECENT_MESSAGE_LOOKBACK_PERIODS = 5
+MESSAGES_ZSTD_LEVEL = 9
+
+def _compress_messages(messages: List[Dict]) -> Binary:
+    return Binary(zstandard.ZstdCompressor(level=MESSAGES_ZSTD_LEVEL).compress(orjson.dumps(messages)))
+
+def _decompress_messages(blob: bytes) -> List[Dict]:
+    return orjson.loads(zstandard.ZstdDecompressor().decompress(blob))
+
+def _failed_write_indexes(result: Any, count: int) -> Dict[int, Exception]:
+    """
+    Maps a bulk write outcome to the batch positions that failed.
+    Only per-document write errors are attributable; anything else fails the whole batch.
+    """
+    if not isinstance(result, Exception):
+        return {}
+    if isinstance(result, BulkWriteError) and not result.details.get("writeConcernErrors"):
+        return {err["index"]: result for err in result.details.get("writeErrors", [])}
+    return {i: result for i in range(count)}
+
 class GroupHistoryService:
     def __init__(self, db: AsyncIOMotorDatabase):
         # We accept the AsyncIOMotorDatabase directly
         self.db = db
         # Use constants from shared schema
         self.tracked_groups_collection = self.db[db_schema.COLLECTION_TRACKED_GROUPS]
-        self.tracked_group_periods_collection = self.db[db_schema.COLLECTION_TRACKED_GROUP_PERIODS]
+        # Read createdAt back as aware UTC (scoped to this collection - the rest of the app still uses naive UTC)
+        self.tracked_group_periods_collection = self.db.get_collection(
+            db_schema.COLLECTION_TRACKED_GROUP_PERIODS,
+            codec_options=CodecOptions(tz_aware=True, tzinfo=timezone.utc)
+        )
         self.tracking_state_collection = self.db[db_schema.COLLECTION_GROUP_TRACKING_STATE]
+        # Tracking results of all bots waiting to be written: (group upsert, period doc, state upsert, future)
+        self._pending_writes: List[tuple] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        # Strong references to fire-and-forget compression tasks
+        self._background_tasks: set = set()
 
     def _build_period_query(self, bot_id, group_id, time_from=None, time_until=None):
         query = {
@@ -29,42 +70,104 @@ class GroupHistoryService:
 
         return query
 
-    async def _build_group_response(self, group_meta, last_periods: int, time_from=None, time_until=None):
+    def _build_period_projection(self, include_messages: bool = True, message_limit: Optional[int] = None) -> Optional[Dict]:
+        # The embedded messages array dominates the document size, so let the server drop or trim it
+        if not include_messages:
+            return {"messages": 0, "messages_zstd": 0}
+        if message_limit is not None and message_limit > 0:
+            return {"messages": {"$slice": -message_limit}}
+        return None
+
+    def _serialize_period(self, doc: Dict, message_limit: Optional[int] = None) -> Dict:
+        doc['_id'] = str(doc['_id'])
+        if isinstance(doc.get('createdAt'), datetime):
+            doc['createdAt'] = doc['createdAt'].isoformat()
+
+        # Compressed (older) period: decode only when messages were requested
+        blob = doc.pop('messages_zstd', None)
+        if blob is not None and doc.get('messages') is None:
+            messages = _decompress_messages(blob)
+            if message_limit is not None and message_limit > 0:
+                messages = messages[-message_limit:]
+            doc['messages'] = messages
+        return doc
+
+    async def _iter_group_periods(self, group_meta, last_periods: int, time_from=None, time_until=None,
+                                  include_messages: bool = True, message_limit: Optional[int] = None) -> AsyncIterator[Dict]:
+        """Yield serialized period documents of one group as they arrive from the cursor."""
         bot_id = group_meta['bot_id']
         group_id = group_meta['group_id']
 
         query = self._build_period_query(bot_id, group_id, time_from, time_until)
-        cursor = self.tracked_group_periods_collection.find(query).sort("periodEnd", -1)
+        projection = self._build_period_projection(include_messages, message_limit)
+        cursor = self.tracked_group_periods_collection.find(query, projection).sort("periodEnd", -1)
 
         if last_periods > 0:
             cursor = cursor.limit(last_periods)
 
-        periods = []
         async for doc in cursor:
-            doc['_id'] = str(doc['_id'])
-            if isinstance(doc.get('createdAt'), datetime):
-                doc['createdAt'] = doc['createdAt'].isoformat()
+            doc = self._serialize_period(doc, message_limit)
             
             # Enrich with display_name from metadata if missing (Normalization on Read support)
             if 'display_name' not in doc:
                  doc['display_name'] = group_meta.get('display_name', 'Unknown')
 
-            periods.append(doc)
+            yield doc
 
+    async def _build_group_response(self, group_meta, last_periods: int, time_from=None, time_until=None,
+                                    include_messages: bool = True, message_limit: Optional[int] = None):
+        periods = [
+            doc async for doc in self._iter_group_periods(
+                group_meta, last_periods, time_from, time_until, include_messages, message_limit
+            )
+        ]
+        return self._format_group_response(group_meta, periods)
+
+    def _format_group_response(self, group_meta, periods: List[Dict]) -> Dict:
         return {
             "group": {
-                "identifier": group_id,
+                "identifier": group_meta['group_id'],
                 "display_name": group_meta.get('display_name', 'Unknown'),
                 "alternate_identifiers": group_meta.get('alternate_identifiers', [])
             },
             "periods": periods
         }
 
-    async def get_tracked_periods(self, bot_id: str, group_id: str = None) -> List[Dict]:
+    def _build_user_periods_pipeline(self, bot_id: str, group_ids: Optional[List[str]], last_periods: int,
+                                     time_from=None, time_until=None) -> List[Dict]:
+        """
+        Aggregation resolving the periods of all groups of a bot (one round trip instead of one per group).
+        last_periods > 0 keeps the N most recent periods of each group.
+        Only _id and the ranking fields are kept, so the window stage never holds message arrays.
+        """
+        match = self._build_period_query(bot_id, None, time_from, time_until)
+        if group_ids is None:
+            del match["tracked_group_unique_identifier"]
+        else:
+            match["tracked_group_unique_identifier"] = {"$in": group_ids}
+
+        pipeline = [
+            {"$match": match},
+            {"$project": {"tracked_group_unique_identifier": 1, "periodEnd": 1}},
+        ]
+        if last_periods > 0:
+            pipeline += [
+                {"$setWindowFields": {
+                    "partitionBy": "$tracked_group_unique_identifier",
+                    "sortBy": {"periodEnd": -1},
+                    "output": {"_period_rank": {"$documentNumber": {}}}
+                }},
+                {"$match": {"_period_rank": {"$lte": last_periods}}},
+                {"$unset": "_period_rank"}
+            ]
+        return pipeline
+
+    async def get_tracked_periods(self, bot_id: str, group_id: str = None, include_messages: bool = True) -> List[Dict]:
         """
         Fetch raw tracked period documents (Flat List).
         Enriches them with 'display_name' from the group metadata.
         Used by API endpoints expecting a flat list of periods.
+        include_messages=False leaves out the messages (listing views only need metadata + messageCount).
         """
         # 1. Build Map
         group_map = {}
@@ -76,14 +179,13 @@ class GroupHistoryService:
         if group_id:
             query["tracked_group_unique_identifier"] = group_id
             
-        cursor = self.tracked_group_periods_collection.find(query).sort("periodEnd", -1)
+        projection = self._build_period_projection(include_messages)
+        cursor = self.tracked_group_periods_collection.find(query, projection).sort("periodEnd", -1)
         
         results = []
         async for doc in cursor:
             # Serialization
-            doc['_id'] = str(doc['_id'])
-            if isinstance(doc.get('createdAt'), datetime):
-                doc['createdAt'] = doc['createdAt'].isoformat()
+            doc = self._serialize_period(doc)
             
             # Enrichment
             gid = doc.get('tracked_group_unique_identifier')
@@ -95,22 +197,63 @@ class GroupHistoryService:
             
         return results
 
-    async def get_group_messages(self, bot_id: str, group_id: str, last_periods: int = 0, time_from: int = None, time_until: int = None) -> Optional[Dict]:
-        """Fetch tracked periods for a specific group."""
+    async def get_group_messages(self, bot_id: str, group_id: str, last_periods: int = 0, time_from: int = None, time_until: int = None,
+                                 include_messages: bool = True, message_limit: Optional[int] = None) -> Optional[Dict]:
+        """
+        Fetch tracked periods for a specific group.
+        include_messages=False returns period metadata only (messageCount is kept);
+        message_limit keeps only the last N messages of each period.
+        """
         group_meta = await self.tracked_groups_collection.find_one({"bot_id": bot_id, "group_id": group_id})
         if not group_meta:
             return None
-        return await self._build_group_response(group_meta, last_periods, time_from, time_until)
+        return await self._build_group_response(group_meta, last_periods, time_from, time_until, include_messages, message_limit)
+
+    async def get_all_user_messages(self, bot_id: str, last_periods: int = 0, time_from: int = None, time_until: int = None,
+                                    include_messages: bool = True, message_limit: Optional[int] = None) -> List[Dict]:
+        """Fetch tracked periods for ALL groups of a user. See get_group_messages for the message controls."""
+        groups = [g async for g in self.tracked_groups_collection.find({"bot_id": bot_id})]
+        if not groups:
+            return []
+
+        if last_periods > 0:
+            # Per-group limited finds on the (bot, group, periodEnd) index, issued concurrently
+            return list(await asyncio.gather(*(
+                self._build_group_response(group_meta, last_periods, time_from, time_until, include_messages, message_limit)
+                for group_meta in groups
+            )))
+
+        # No per-group limit: one find, its sort walks the (bot, group, periodEnd) index order
+        periods_by_group = {g['group_id']: [] for g in groups}
+        query = self._build_period_query(bot_id, {"$in": list(periods_by_group)}, time_from, time_until)
+        projection = self._build_period_projection(include_messages, message_limit)
+        cursor = self.tracked_group_periods_collection.find(query, projection).sort(
+            [("tracked_group_unique_identifier", 1), ("periodEnd", -1)]
+        )
+        async for doc in cursor:
+            periods_by_group[doc['tracked_group_unique_identifier']].append(self._serialize_period(doc, message_limit))
 
-    async def get_all_user_messages(self, bot_id: str, last_periods: int = 0, time_from: int = None, time_until: int = None) -> List[Dict]:
-        """Fetch tracked periods for ALL groups of a user."""
         results = []
-        async for group_meta in self.tracked_groups_collection.find({"bot_id": bot_id}):
-             response = await self._build_group_response(group_meta, last_periods, time_from, time_until)
-             results.append(response)
+        for group_meta in groups:
+            periods = periods_by_group[group_meta['group_id']]
+            # Enrich with display_name from metadata if missing (Normalization on Read support)
+            for doc in periods:
+                if 'display_name' not in doc:
+                    doc['display_name'] = group_meta.get('display_name', 'Unknown')
+            results.append(self._format_group_response(group_meta, periods))
 
         return results
 
+    async def stream_all_user_messages(self, bot_id: str, last_periods: int = 0, time_from: int = None, time_until: int = None,
+                                       include_messages: bool = True, message_limit: Optional[int] = None) -> AsyncIterator[Dict]:
+        """
+        Stream tracked periods for ALL groups of a user, one period document at a time.
+        Same filters as get_all_user_messages, but nothing is accumulated in memory.
+        """
+        async for group_meta in self.tracked_groups_collection.find({"bot_id": bot_id}):
+            async for doc in self._iter_group_periods(group_meta, last_periods, time_from, time_until, include_messages, message_limit):
+                yield doc
+
     async def delete_group_messages(self, bot_id: str, group_id: str, last_periods: int = 0, time_from: int = None, time_until: int = None) -> int:
         """Delete tracked periods for a specific group."""
         query = self._build_period_query(bot_id, group_id, time_from, time_until)
@@ -130,17 +273,21 @@ class GroupHistoryService:
 
     async def delete_all_user_messages(self, bot_id: str, last_periods: int = 0, time_from: int = None, time_until: int = None) -> int:
         """Delete all tracked periods for a user."""
-        # Optimization: If no filters, do a bulk delete (Item #007)
-        if last_periods == 0 and time_from is None and time_until is None:
-             result = await self.tracked_group_periods_collection.delete_many({"bot_id": bot_id})
-             return result.deleted_count
-
-        total_deleted = 0
-        async for group_meta in self.tracked_groups_collection.find({"bot_id": bot_id}):
-            deleted = await self.delete_group_messages(bot_id, group_meta['group_id'], last_periods, time_from, time_until)
-            total_deleted += deleted
+        # Optimization: without a per-group limit, a single bulk delete (Item #007)
+        if last_periods == 0:
+            query = self._build_period_query(bot_id, None, time_from, time_until)
+            del query["tracked_group_unique_identifier"]
+            result = await self.tracked_group_periods_collection.delete_many(query)
+            return result.deleted_count
 
-        return total_deleted
+        # Most recent N periods of every group, resolved in one aggregation
+        pipeline = self._build_user_periods_pipeline(bot_id, None, last_periods, time_from, time_until)
+        pipeline.append({"$project": {"_id": 1}})
+        ids = [doc["_id"] async for doc in self.tracked_group_periods_collection.aggregate(pipeline, allowDiskUse=True)]
+        if not ids:
+            return 0
+        result = await self.tracked_group_periods_collection.delete_many({"_id": {"$in": ids}})
+        return result.deleted_count
     
     async def save_tracking_result(self, bot_id: str, config_group_id: str, config_display_name: str, config_schedule: str, 
                            messages: List[Dict], start_ts: int, end_ts: int, alternate_identifiers_set: set):
@@ -149,14 +296,18 @@ class GroupHistoryService:
         1. Upserts Group Metadata.
         2. Inserts Period Document.
         3. Updates Last Run State.
+
+        Writes arriving within PERIOD_WRITE_FLUSH_DELAY_SECONDS (groups of any bot firing on the
+        same cron tick) are flushed together - one round trip per collection instead of 3 per group.
+        Returns once this result has been written; raises if the batch failed.
         """
         
-        # 1. Upsert Group Metadata
+        # 1. Group Metadata
         # Ensure we have the latest metadata
         alternate_identifiers_set.add(config_group_id)
         alternate_identifiers_set.add(config_display_name)
 
-        await self.tracked_groups_collection.update_one(
+        group_update = UpdateOne(
             {"bot_id": bot_id, "group_id": config_group_id},
             {"$set": {
                 "bot_id": bot_id,
@@ -168,27 +319,110 @@ class GroupHistoryService:
             upsert=True
         )
 
-        # 2. Insert Period Document
+        # 2. Period Document
         period_doc = {
             "bot_id": bot_id,
             "tracked_group_unique_identifier": config_group_id,
             "periodStart": start_ts,
             "periodEnd": end_ts,
             "messageCount": len(messages),
-            "createdAt": datetime.utcnow(),
+            "createdAt": datetime.now(timezone.utc),
             "messages": messages,
             # Store display name for creating independent record
             "display_name": config_display_name 
         }
-        await self.tracked_group_periods_collection.insert_one(period_doc)
 
-        # 3. Update last run state
-        state_key = {"bot_id": bot_id, "group_id": config_group_id}
-        await self.tracking_state_collection.update_one(
-            state_key,
+        # 3. Last run state
+        state_update = UpdateOne(
+            {"bot_id": bot_id, "group_id": config_group_id},
             {"$set": {"last_run_ts": end_ts}},
             upsert=True
         )
+
+        done = asyncio.get_running_loop().create_future()
+        self._pending_writes.append((group_update, period_doc, state_update, done))
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_pending_writes())
+        await done
+
+    async def _flush_pending_writes(self):
+        await asyncio.sleep(PERIOD_WRITE_FLUSH_DELAY_SECONDS)
+        # Detach the batch first so saves arriving during the writes start a new one
+        self._flush_task = None
+        batch, self._pending_writes = self._pending_writes, []
+        if not batch:
+            return
+
+        # One batch spans many bots - a write error only fails the entries it belongs to
+        failed: Dict[int, Exception] = {}
+        # Group metadata and period inserts are independent - issue both round trips at once
+        results = await asyncio.gather(
+            self.tracked_groups_collection.bulk_write([entry[0] for entry in batch], ordered=False),
+            self.tracked_group_periods_collection.insert_many([entry[1] for entry in batch], ordered=False),
+            return_exceptions=True
+        )
+        for result in results:
+            failed.update(_failed_write_indexes(result, len(batch)))
+
+        # State last: a group whose period was not stored must be re-tracked next run
+        stored = [i for i in range(len(batch)) if i not in failed]
+        if stored:
+            try:
+                await self.tracking_state_collection.bulk_write([batch[i][2] for i in stored], ordered=False)
+            except Exception as e:
+                failed.update({stored[i]: e for i in _failed_write_indexes(e, len(stored))})
+
+        for i, e in failed.items():
+            entry = batch[i]
+            logger.error(f"Failed to save tracking result for {entry[1]['bot_id']}/{entry[1]['tracked_group_unique_identifier']}: {e}")
+            if not entry[3].done():
+                entry[3].set_exception(e)
+
+        # Periods that just dropped out of the deduplication look-back can be compressed
+        group_ids_by_bot: Dict[str, set] = {}
+        saved = [entry for i, entry in enumerate(batch) if i not in failed]
+        for entry in saved:
+            group_ids_by_bot.setdefault(entry[1]["bot_id"], set()).add(entry[1]["tracked_group_unique_identifier"])
+
+        logger.info(f"Saved {len(saved)} of {len(batch)} tracking result(s) of {len(group_ids_by_bot)} bot(s) in one batch.")
+        for entry in saved:
+            if not entry[3].done():
+                entry[3].set_result(None)
+
+        for bot_id, group_ids in group_ids_by_bot.items():
+            task = asyncio.create_task(self.compress_old_periods(bot_id, group_ids))
+            self._background_tasks.add(task)
+            task.add_done_callback(self._background_tasks.discard)
+
+    async def compress_old_periods(self, bot_id: str, group_ids: set):
+        """
+        Rewrites the messages of the period that just dropped out of the RECENT_MESSAGE_LOOKBACK_PERIODS
+        most recent ones (per group) as a zstd blob. Each save pushes exactly one period out, so only that
+        one is read; the walk stays on the (bot, group, periodEnd) index instead of rescanning the history.
+        Runs in the background after saves; failures are only logged.
+        """
+        for group_id in group_ids:
+            try:
+                cursor = self.tracked_group_periods_collection.find(
+                    {"bot_id": bot_id, "tracked_group_unique_identifier": group_id},
+                    {"messages": 1}
+                ).sort("periodEnd", -1).skip(RECENT_MESSAGE_LOOKBACK_PERIODS).limit(1)
+
+                updates = []
+                async for doc in cursor:
+                    if not isinstance(doc.get("messages"), list):
+                        continue  # Already compressed
+                    # zstd level 9 over a full period is CPU work; zstandard releases the GIL, so keep it off the loop
+                    blob = await asyncio.to_thread(_compress_messages, doc["messages"])
+                    updates.append(UpdateOne(
+                        {"_id": doc["_id"]},
+                        {"$set": {"messages": None, "messages_zstd": blob}}
+                    ))
+                if updates:
+                    await self.tracked_group_periods_collection.bulk_write(updates, ordered=False)
+                    logger.info(f"Compressed messages of {len(updates)} old period(s) for {bot_id}/{group_id}.")
+            except Exception as e:
+                logger.warning(f"Failed to compress old periods for {bot_id}/{group_id}: {e}")
         
     async def get_last_run(self, bot_id: str, group_id: str) -> Optional[int]:
         state_key = {'bot_id': bot_id, 'group_id': group_id}
@@ -205,12 +439,16 @@ class GroupHistoryService:
         # Fetch last few periods
         cursor = self.tracked_group_periods_collection.find(
             {"bot_id": bot_id, "tracked_group_unique_identifier": group_id},
-            {"messages.provider_message_id": 1}
-        ).sort("periodEnd", -1).limit(5) # Look back 5 periods
+            {"messages.provider_message_id": 1, "messages_zstd": 1}
+        ).sort("periodEnd", -1).limit(RECENT_MESSAGE_LOOKBACK_PERIODS)
         
         existing_ids = set()
         async for doc in cursor:
-            for msg in doc.get('messages', []):
+            messages = doc.get('messages')
+            if messages is None and doc.get('messages_zstd') is not None:
+                # Only if newer periods were deleted - normally the look-back periods are not compressed
+                messages = _decompress_messages(doc['messages_zstd'])
+            for msg in messages or []:
                 pid = msg.get('provider_message_id')
                 if pid:
                     existing_ids.add(pid)
@@ -1,11 +1,14 @@
 
 import asyncio
+import bisect
+import hashlib
+import os
 import time
-import random
 import logging
 from datetime import datetime
+from operator import itemgetter
 from zoneinfo import ZoneInfo
-from typing import Dict
+from typing import Dict, Callable, Optional
 
 from config_models import PeriodicGroupTrackingConfig
 from services.session_manager import SessionManager
@@ -16,49 +19,80 @@ from .history_service import GroupHistoryService
 
 logger = logging.getLogger(__name__)
 
+# Max concurrent action item extractions (LLM calls) across all tracked groups
+LLM_CONCURRENCY = int(os.getenv("GROUPTRACKER_LLM_CONCURRENCY", "4"))
+
 from motor.motor_asyncio import AsyncIOMotorCollection
 
+def _stable_jitter(bot_id: str, group_id: str, span_seconds: float) -> float:
+    """
+    Start delay in [0, span_seconds) derived from the (bot, group) pair.
+    Stable across runs, so groups sharing a tick keep their spread instead of re-rolling
+    (and occasionally colliding) on every fire.
+    """
+    digest = hashlib.blake2b(f"{bot_id}|{group_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2**64 * span_seconds
+
 class GroupTrackingRunner:
-    def __init__(self, chatbot_instances: Dict[str, SessionManager], history_service: GroupHistoryService, queue_manager: AsyncMessageDeliveryQueueManager, extractor: ActionItemExtractor, window_calculator: CronWindowCalculator):
+    def __init__(self, chatbot_instances: Dict[str, SessionManager], history_service: GroupHistoryService, queue_manager: AsyncMessageDeliveryQueueManager, extractor: ActionItemExtractor, window_calculator: CronWindowCalculator,
+                 instance_resolver: Optional[Callable[[str], Optional[SessionManager]]] = None):
         self.chatbot_instances = chatbot_instances
+        # bot_id -> SessionManager lookup backed by the active bots index (O(1)); falls back to a scan
+        self.instance_resolver = instance_resolver
         self.history = history_service
         self.queue_manager = queue_manager
         self.extractor = extractor
         self.window_calculator = window_calculator
+        # Groups sharing a cron tick would otherwise hit the LLM provider all at once
+        self._llm_semaphore = asyncio.Semaphore(LLM_CONCURRENCY)
+        # Strong references to detached extract -> enqueue tasks
+        self._extraction_tasks: set = set()
+        # timezone name -> ZoneInfo (UTC for invalid names, warned about once)
+        self._timezones: Dict[str, ZoneInfo] = {}
+
+    def _get_timezone(self, timezone: str, bot_id: str) -> ZoneInfo:
+        tz = self._timezones.get(timezone)
+        if tz is None:
+            try:
+                tz = ZoneInfo(timezone)
+            except Exception:
+                logger.warning(f"Invalid timezone '{timezone}' for bot {bot_id}, using UTC")
+                tz = ZoneInfo("UTC")
+            self._timezones[timezone] = tz
+        return tz
 
-    async def run_tracking_cycle(self, bot_id: str, config: PeriodicGroupTrackingConfig, timezone: str = "UTC"):
+    def find_bot_instance(self, bot_id: str) -> Optional[SessionManager]:
+        if self.instance_resolver:
+            return self.instance_resolver(bot_id)
+        for instance in self.chatbot_instances.values():
+            if instance.bot_id == bot_id:
+                return instance
+        return None
+
+    async def run_tracking_cycle(self, bot_id: str, config: PeriodicGroupTrackingConfig, timezone: str = "UTC",
+                                 max_jitter_seconds: float = 0.0):
         """
         Executes a single tracking cycle for a group.
-        Fetch -> Window -> Filter -> Save -> Extract -> Queue.
+        Window -> Fetch -> Filter -> Save, with Extract -> Queue detached (see wait_for_pending_extractions).
+        max_jitter_seconds spreads the start when other groups trigger at the same cron time.
         """
         # Add jitter to prevent rate limiting if multiple groups trigger at the same cron time
-        delay = random.uniform(0, 60)
-        logger.info(f"Scheduled tracking for {bot_id}/{config.groupIdentifier} starting in {delay:.2f}s")
-        await asyncio.sleep(delay)
+        if max_jitter_seconds > 0:
+            delay = _stable_jitter(bot_id, config.groupIdentifier, max_jitter_seconds)
+            logger.info(f"Scheduled tracking for {bot_id}/{config.groupIdentifier} starting in {delay:.2f}s")
+            await asyncio.sleep(delay)
         
         logger.info(f"Starting tracking job for bot {bot_id}, group {config.groupIdentifier}")
 
         # Find the chatbot instance for this user
-        target_instance = None
-        for instance in self.chatbot_instances.values():
-            if instance.bot_id == bot_id:
-                target_instance = instance
-                break
+        target_instance = self.find_bot_instance(bot_id)
 
         if not target_instance or not target_instance.provider_instance or not target_instance.provider_instance.is_connected:
             logger.error(f"Chatbot not active or invalid provider for bot {bot_id}")
             return
 
-        # Fetch messages
-        try:
-            # Polymorphic call
-            messages = await target_instance.provider_instance.fetch_historic_messages(config.groupIdentifier, limit=500, skip_media_download=True)
-            if messages is None:
-                 logger.error(f"Fetch failed for {bot_id}/{config.groupIdentifier} (returned None). Aborting job to prevent data loss. State will NOT be updated.")
-                 return # Abort without updating state, allowing retry next time
-        except Exception as e:
-             logger.error(f"Failed to fetch historic messages for {bot_id}/{config.groupIdentifier}: {e}")
-             return
+        # Single clock read for the whole cycle: cron window and message ingest time
+        now_ns = time.time_ns()
 
         # Determine time window
         try:
@@ -68,7 +102,7 @@ class GroupTrackingRunner:
              current_cron_start_dt, current_cron_end_dt = self.window_calculator.calculate_window(
                  cron_expression=config.cronTrackingSchedule,
                  timezone=timezone,
-                 now_dt=datetime.now(ZoneInfo("UTC")), 
+                 now_dt=datetime.fromtimestamp(now_ns / 1e9, tz=ZoneInfo("UTC")),
                  last_run_ts=last_run_ts
              )
 
@@ -79,11 +113,33 @@ class GroupTrackingRunner:
              now_ts = int(current_cron_end_dt.timestamp() * 1000)
              last_run_ts = int(current_cron_start_dt.timestamp() * 1000)
 
+             # Empty window (duplicate fire for an already processed slot) - nothing to fetch
+             if last_run_ts >= now_ts:
+                 logger.info(f'Tracking job for {bot_id}/{config.groupIdentifier}: window already processed (start {current_cron_start_dt} >= end {current_cron_end_dt}). Skipping.')
+                 return
+
              logger.info(f'Tracking job for {bot_id}/{config.groupIdentifier}: Window calculated as {current_cron_start_dt} -> {current_cron_end_dt}')
         except Exception as e:
             logger.error(f'Failed to calculate cron window for {bot_id}/{config.groupIdentifier}: {e}. Aborting.')
             return
 
+        # Fetch messages (window computed first so the provider can pre-filter)
+        try:
+            # Polymorphic call
+            messages = await target_instance.provider_instance.fetch_historic_messages(
+                config.groupIdentifier,
+                limit=500,
+                skip_media_download=True,
+                since_ts_ms=last_run_ts,
+                until_ts_ms=now_ts
+            )
+            if messages is None:
+                 logger.error(f"Fetch failed for {bot_id}/{config.groupIdentifier} (returned None). Aborting job to prevent data loss. State will NOT be updated.")
+                 return # Abort without updating state, allowing retry next time
+        except Exception as e:
+             logger.error(f"Failed to fetch historic messages for {bot_id}/{config.groupIdentifier}: {e}")
+             return
+
 
         # Filter and Transform
         transformed_messages = []
@@ -93,54 +149,70 @@ class GroupTrackingRunner:
         seen_message_ids = await self.history.get_recent_message_ids(bot_id, config.groupIdentifier)
         logger.info(f"Loaded {len(seen_message_ids)} recent message IDs for deduplication.")
 
-        for msg in messages:
-            msg_ts = msg.get('originating_time')
-            if not msg_ts:
+        # Batch ingest time, shared by all messages accepted in this run
+        accepted_time = now_ns // 1_000_000
+
+        # Select the window. Baileys returns messages in time order, so the window is a
+        # contiguous slice found by binary search; otherwise filter and sort.
+        timestamps = [msg.get('originating_time') or 0 for msg in messages]
+        if all(a <= b for a, b in zip(timestamps, timestamps[1:])):
+            lo = bisect.bisect_right(timestamps, last_run_ts)
+            hi = bisect.bisect_right(timestamps, now_ts)
+            window_messages = [msg for msg in messages[lo:hi] if msg.get('originating_time')]
+        else:
+            window_messages = [msg for msg, ts in zip(messages, timestamps) if ts and last_run_ts < ts <= now_ts]
+            window_messages.sort(key=itemgetter('originating_time'))
+
+        # Check for duplicate messages
+        new_messages = []
+        for msg in window_messages:
+            provider_message_id = msg.get('provider_message_id')
+            if provider_message_id in seen_message_ids:
+                logger.warning(f"Duplicate message {provider_message_id} skipped.")
                 continue
+            seen_message_ids.add(provider_message_id)
+            new_messages.append(msg)
+
+        # Check which are bot messages (single batched lookup)
+        bot_flags = target_instance.provider_instance.are_bot_messages(
+            [msg.get('provider_message_id') for msg in new_messages]
+        )
 
-            if last_run_ts < msg_ts <= now_ts:
-                # Check for duplicate message
-                provider_message_id = msg.get('provider_message_id')
-                if provider_message_id in seen_message_ids:
-                    logger.warning(f"Duplicate message {provider_message_id} skipped.")
-                    continue
-                seen_message_ids.add(provider_message_id)
-                
-                # Check if it's a bot message
-                is_bot = target_instance.provider_instance.is_bot_message(provider_message_id)
-
-                if is_bot:
-                    sender_data = {
-                        "identifier": f"bot_{bot_id}",
-                        "display_name": f"Bot ({bot_id})",
-                        "alternate_identifiers": msg.get('actual_sender', {}).get('alternate_identifiers', [])
-                    }
-                else:
-                    sender_data = {
-                        "identifier": msg.get('sender'),
-                        "display_name": msg.get('display_name'),
-                        "alternate_identifiers": msg.get('alternate_identifiers', [])
-                    }
-
-                # Collect group alternates if available in msg
-                if msg.get('group'):
-                    for alt in msg['group'].get('alternate_identifiers', []):
-                        alternate_identifiers_set.add(alt)
-
-                transformed_msg = {
-                    "sender": sender_data,
-                    "message": msg.get('message'),
-                    "accepted_time": int(time.time() * 1000),
-                    "originating_time": msg_ts,
-                    "provider_message_id": provider_message_id
+        # Collect group alternates. Every message of the group carries (nearly) the same list,
+        # so each distinct list is merged once instead of once per message.
+        alternate_identifiers_set.update(*{
+            tuple(msg['group'].get('alternate_identifiers', [])) for msg in new_messages if msg.get('group')
+        })
+
+        bot_identifier = f"bot_{bot_id}"
+        bot_display_name = f"Bot ({bot_id})"
+        append_message = transformed_messages.append
+
+        for msg, is_bot in zip(new_messages, bot_flags):
+            if is_bot:
+                sender_data = {
+                    "identifier": bot_identifier,
+                    "display_name": bot_display_name,
+                    "alternate_identifiers": msg.get('actual_sender', {}).get('alternate_identifiers', [])
+                }
+            else:
+                sender_data = {
+                    "identifier": msg.get('sender'),
+                    "display_name": msg.get('display_name'),
+                    "alternate_identifiers": msg.get('alternate_identifiers', [])
                 }
-                transformed_messages.append(transformed_msg)
 
-        # Sort messages by originating_time
-        transformed_messages.sort(key=lambda x: x['originating_time'])
+            append_message({
+                "sender": sender_data,
+                "message": msg.get('message'),
+                "accepted_time": accepted_time,
+                "originating_time": msg['originating_time'],
+                "provider_message_id": msg.get('provider_message_id')
+            })
 
-        # Save to History Service
-        await self.history.save_tracking_result(
+        # Save to History Service. The write (batched, see GroupHistoryService) runs
+        # concurrently with the action item extraction, which does not depend on it.
+        save_task = asyncio.create_task(self.history.save_tracking_result(
             bot_id=bot_id,
             config_group_id=config.groupIdentifier,
             config_display_name=config.displayName,
@@ -149,56 +221,85 @@ class GroupTrackingRunner:
             start_ts=last_run_ts,
             end_ts=now_ts,
             alternate_identifiers_set=alternate_identifiers_set
-        )
+        ))
+
+        # Extraction is detached from the scheduled job: the job completes once its period is persisted,
+        # so a slow LLM never holds the job slot (max_instances=1) into the next fire
+        if transformed_messages:
+            extraction_task = asyncio.create_task(
+                self._extract_and_enqueue(target_instance, bot_id, config, transformed_messages, timezone, save_task)
+            )
+            self._extraction_tasks.add(extraction_task)
+            extraction_task.add_done_callback(self._extraction_tasks.discard)
+
+        await save_task
 
         logger.info(f"Completed tracking job for {bot_id}/{config.groupIdentifier}. Saved {len(transformed_messages)} messages.")
 
-        # Extract Action Items logic
         if not transformed_messages:
             logger.info(f"No messages in this period for {bot_id}/{config.groupIdentifier}")
-            return 
-        else:
-            try:
-                # User Timezone for LLM Context
-                try:
-                    user_tz = ZoneInfo(timezone)
-                except Exception:
-                    logger.warning(f"Invalid timezone '{timezone}' for bot {bot_id}, using UTC")
-                    user_tz = ZoneInfo("UTC")
-
-                # Get user's LLM config and language preference
-                language_code = target_instance.config.configurations.user_details.language_code
-                
-                # Extract action items
-                action_items = await self.extractor.extract(
-                    messages=transformed_messages,
-                    bot_id=bot_id,
-                    timezone=user_tz,
-                    group_id=config.groupIdentifier,
-                    language_code=language_code
-                )
-                
-                if not action_items:
-                     logger.info(f"No actionable items found by LLM for {bot_id}/{config.groupIdentifier}")
-                     return
-
-                # Send items to Queue
-                if self.queue_manager:
-                    logger.info(f"Queuing {len(action_items)} items for {bot_id}")
-                    for item in action_items:
-                        # Inject Group Name
-                        item["group_display_name"] = config.displayName
-                        
-                        # Add to Queue
-                        # Add to Queue
-                        await self.queue_manager.add_item(
-                            content=item,
-                            message_type=QueueMessageType.ICS_ACTIONABLE_ITEM,
-                            bot_id=bot_id, # Queue manager expects bot_id here for routing
-                            provider_name="whatsAppBaileys" 
-                        )
-                else:
-                    logger.error("AsyncMessageDeliveryQueueManager not initialized! Cannot send items.")
-
-            except Exception as e:
-                logger.error(f"Failed to process action items for bot {bot_id}: {e}")
+
+    async def wait_for_pending_extractions(self):
+        """Wait until all detached extractions started so far have finished (shutdown, tests)."""
+        if self._extraction_tasks:
+            await asyncio.gather(*list(self._extraction_tasks), return_exceptions=True)
+
+    async def _extract_and_enqueue(self, target_instance: SessionManager, bot_id: str, config: PeriodicGroupTrackingConfig,
+                                   messages: list, timezone: str, save_task: asyncio.Task):
+        action_items = await self._extract_action_items(target_instance, bot_id, config, messages, timezone)
+
+        # The period must be persisted before any of its items are delivered
+        try:
+            await save_task
+        except Exception:
+            logger.warning(f"Period for {bot_id}/{config.groupIdentifier} was not saved. Dropping its action items, the window is retried next run.")
+            return
+
+        try:
+            if not action_items:
+                 logger.info(f"No actionable items found by LLM for {bot_id}/{config.groupIdentifier}")
+                 return
+
+            # Send items to Queue
+            if self.queue_manager:
+                logger.info(f"Queuing {len(action_items)} items for {bot_id}")
+                provider_name = target_instance.config.configurations.chat_provider_config.provider_name
+                for item in action_items:
+                    # Inject Group Name
+                    item["group_display_name"] = config.displayName
+                    
+                    # Add to Queue
+                    await self.queue_manager.add_item(
+                        content=item,
+                        message_type=QueueMessageType.ICS_ACTIONABLE_ITEM,
+                        bot_id=bot_id, # Queue manager expects bot_id here for routing
+                        provider_name=provider_name
+                    )
+            else:
+                logger.error("AsyncMessageDeliveryQueueManager not initialized! Cannot send items.")
+
+        except Exception as e:
+            logger.error(f"Failed to process action items for bot {bot_id}: {e}")
+
+    async def _extract_action_items(self, target_instance: SessionManager, bot_id: str, config: PeriodicGroupTrackingConfig,
+                                    messages: list, timezone: str):
+        try:
+            # User Timezone for LLM Context
+            user_tz = self._get_timezone(timezone, bot_id)
+
+            # Get user's LLM config and language preference
+            language_code = target_instance.config.configurations.user_details.language_code
+
+            # Extract action items (LLM calls are bounded by the shared slots; excess runs wait for a slot
+            # while their window is being saved, and a run backing off from a provider error frees its slot)
+            return await self.extractor.extract(
+                messages=messages,
+                bot_id=bot_id,
+                timezone=user_tz,
+                group_id=config.groupIdentifier,
+                language_code=language_code,
+                llm_slots=self._llm_semaphore
+            )
+        except Exception as e:
+            logger.error(f"Failed to process action items for bot {bot_id}: {e}")
+            return None
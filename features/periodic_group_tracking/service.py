@@ -4,12 +4,11 @@ import logging
 import random
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from typing import Dict
+from typing import Dict, Callable, Optional, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase, AsyncIOMotorCollection
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
-from croniter import croniter
 
 from services.session_manager import SessionManager
 from config_models import PeriodicGroupTrackingConfig
@@ -17,13 +16,23 @@ from async_message_delivery_queue_manager import AsyncMessageDeliveryQueueManage
 from .history_service import GroupHistoryService
 from .runner import GroupTrackingRunner
 from .extractor import ActionItemExtractor
-from .cron_window import CronWindowCalculator
+from .cron_window import CronWindowCalculator, CachedCroniter
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 
+# Max start delay for jobs whose cron tick is shared with other tracked groups
+SHARED_TICK_JITTER_SECONDS = 5.0
+
+# How late a tracking job may still start after its scheduled cron time
+JOB_MISFIRE_GRACE_SECONDS = 300
+
+# Consecutive cron runs sampled when estimating an expression's longest interval
+CRON_INTERVAL_SAMPLES = 8
+
 class GroupTracker:
-    def __init__(self, db: AsyncIOMotorDatabase, chatbot_instances: Dict[str, SessionManager], async_message_delivery_queue_manager: AsyncMessageDeliveryQueueManager = None):
+    def __init__(self, db: AsyncIOMotorDatabase, chatbot_instances: Dict[str, SessionManager], async_message_delivery_queue_manager: AsyncMessageDeliveryQueueManager = None,
+                 instance_resolver: Optional[Callable[[str], Optional[SessionManager]]] = None):
         
         # Dependencies
         self.chatbot_instances = chatbot_instances
@@ -41,12 +50,25 @@ class GroupTracker:
             history_service=self.history,
             queue_manager=self.async_message_delivery_queue_manager,
             extractor=extractor,
-            window_calculator=window_calculator
+            window_calculator=window_calculator,
+            instance_resolver=instance_resolver
         )
         
         # Scheduler
-        self.scheduler = AsyncIOScheduler()
-        self.jobs = {}
+        # The scheduler's job store is the single source of truth for active jobs (ids: "{bot_id}_{group}")
+        # Coroutine jobs already run as concurrent tasks on the loop. The grace time keeps jobs
+        # that fire late on a busy shared tick from being dropped as missed (APScheduler default 1s).
+        self.scheduler = AsyncIOScheduler(job_defaults={
+            "misfire_grace_time": JOB_MISFIRE_GRACE_SECONDS,
+            "coalesce": True,
+            "max_instances": 1
+        })
+        # cron expression -> longest interval between runs (seconds), see _get_cron_interval
+        self._cron_interval_cache: Dict[str, float] = {}
+        # (normalized cron fields, timezone) -> number of scheduled jobs firing on that tick, and each
+        # job's key; maintained on add/remove so a firing job does not have to scan the job store
+        self._schedule_job_counts: Dict[Tuple[str, str], int] = {}
+        self._job_schedule_keys: Dict[str, Tuple[str, str]] = {}
 
     def start(self):
         self.scheduler.start()
@@ -56,17 +78,24 @@ class GroupTracker:
         self.scheduler.shutdown(wait=False)
         logger.info("GroupTracker scheduler shutdown.")
 
+    def _get_cron_interval(self, cron_expression: str) -> float:
+        """
+        Longest gap (seconds) between consecutive runs of a cron expression, memoized per expression.
+        Cron intervals can vary (weekends, months), so the max over several consecutive runs is used.
+        """
+        interval = self._cron_interval_cache.get(cron_expression)
+        if interval is None:
+            cron_iter = CachedCroniter(cron_expression, datetime.now(ZoneInfo("UTC")))
+            runs = [cron_iter.get_next(datetime) for _ in range(CRON_INTERVAL_SAMPLES + 1)]
+            interval = max((later - earlier).total_seconds() for earlier, later in zip(runs, runs[1:]))
+            self._cron_interval_cache[cron_expression] = interval
+        return interval
+
     def _calculate_max_interval(self, configs: list[PeriodicGroupTrackingConfig]) -> int:
         max_interval = 0
-        now_dt = datetime.now()
         for config in configs:
             try:
-                # We calculate the interval between two potential future executions to estimate the period.
-                # Note: Cron intervals can vary (e.g. months). We take a sample.
-                iter = croniter(config.cronTrackingSchedule, now_dt)
-                next_1 = iter.get_next(datetime)
-                next_2 = iter.get_next(datetime)
-                interval = (next_2 - next_1).total_seconds()
+                interval = self._get_cron_interval(config.cronTrackingSchedule)
                 if interval > max_interval:
                     max_interval = interval
             except Exception:
@@ -91,34 +120,50 @@ class GroupTracker:
                     logger.info(f"Stopped tracking job {job.id} for bot {bot_id}")
                 except Exception as e:
                     logger.warning(f"Failed to remove job {job.id}: {e}")
-        
-        # Sync self.jobs
-        keys_to_remove = [k for k in self.jobs if k.startswith(prefix)]
-        for k in keys_to_remove:
-            del self.jobs[k]
+                self._forget_job_schedule(job.id)
+
+    def _remember_job_schedule(self, job_id: str, trigger: CronTrigger, timezone: str):
+        # The parsed trigger's fields are the normalized schedule ("0  * * * MON" == "0 * * * mon")
+        self._forget_job_schedule(job_id)
+        key = (str(trigger), timezone)
+        self._job_schedule_keys[job_id] = key
+        self._schedule_job_counts[key] = self._schedule_job_counts.get(key, 0) + 1
+
+    def _forget_job_schedule(self, job_id: str):
+        key = self._job_schedule_keys.pop(job_id, None)
+        if key is None:
+            return
+        remaining = self._schedule_job_counts.get(key, 0) - 1
+        if remaining > 0:
+            self._schedule_job_counts[key] = remaining
+        else:
+            self._schedule_job_counts.pop(key, None)
 
     def update_jobs(self, bot_id: str, tracking_configs: list[PeriodicGroupTrackingConfig], timezone: str = "UTC"):
-        # Remove existing jobs for this user by querying the scheduler directly
-        # This ensures we catch any zombie jobs even if self.jobs is out of sync
-        all_jobs = self.scheduler.get_jobs()
+        # Diff against the scheduler's jobs for this user: unchanged jobs are kept as they are
+        # (no trigger re-parse, next run time preserved), only added/changed/removed groups are touched
         prefix = f"{bot_id}_"
-        
-        for job in all_jobs:
-            if job.id.startswith(prefix):
-                try:
-                    self.scheduler.remove_job(job.id)
-                    logger.info(f"Removed tracking job {job.id} for bot {bot_id}")
-                except Exception as e:
-                    logger.warning(f"Failed to remove job {job.id}: {e}")
-        
-        # Sync self.jobs (optional, but good for consistency)
-        keys_to_remove = [k for k in self.jobs if k.startswith(prefix)]
-        for k in keys_to_remove:
-            del self.jobs[k]
-
-        # Add new jobs
-        for config in tracking_configs:
-            job_id = f"{bot_id}_{config.groupIdentifier}"
+        current_jobs = {job.id: job for job in self.scheduler.get_jobs() if job.id.startswith(prefix)}
+        desired_configs = {f"{bot_id}_{config.groupIdentifier}": config for config in tracking_configs}
+
+        unchanged_ids = {
+            job_id for job_id, config in desired_configs.items()
+            if job_id in current_jobs and tuple(current_jobs[job_id].args) == (bot_id, config, timezone)
+        }
+
+        # Removed or changed jobs (changed ones are re-added below)
+        for job_id in current_jobs.keys() - unchanged_ids:
+            try:
+                self.scheduler.remove_job(job_id)
+                logger.info(f"Stopped tracking job {job_id} for bot {bot_id}")
+            except Exception as e:
+                logger.warning(f"Failed to remove job {job_id}: {e}")
+            self._forget_job_schedule(job_id)
+
+        # Add new or changed jobs
+        for job_id, config in desired_configs.items():
+            if job_id in unchanged_ids:
+                continue
             try:
                 trigger = CronTrigger.from_crontab(config.cronTrackingSchedule, timezone=ZoneInfo(timezone))
                 self.scheduler.add_job(
@@ -128,22 +173,24 @@ class GroupTracker:
                     args=[bot_id, config, timezone],
                     replace_existing=True
                 )
-                self.jobs[job_id] = True
+                self._remember_job_schedule(job_id, trigger, timezone)
                 logger.info(f"Added tracking job {job_id} with schedule {config.cronTrackingSchedule} for bot {bot_id}")
             except Exception as e:
                 logger.error(f"Failed to add tracking job {job_id}: {e}")
 
         # Update provider cache policy
         max_interval = self._calculate_max_interval(tracking_configs)
-        target_instance = None
-        for instance in self.chatbot_instances.values():
-            if instance.bot_id == bot_id:
-                target_instance = instance
-                break
+        target_instance = self.runner.find_bot_instance(bot_id)
 
         if target_instance and target_instance.provider_instance:
             target_instance.provider_instance.update_cache_policy(max_interval)
 
+    def _count_jobs_sharing_schedule(self, bot_id: str, config: PeriodicGroupTrackingConfig) -> int:
+        key = self._job_schedule_keys.get(f"{bot_id}_{config.groupIdentifier}")
+        return self._schedule_job_counts.get(key, 0) if key else 0
+
     async def track_group_context(self, bot_id: str, config: PeriodicGroupTrackingConfig, timezone: str = "UTC"):
+        # Jitter only when other jobs fire on the same tick; LLM concurrency is bounded in the runner
+        max_jitter = SHARED_TICK_JITTER_SECONDS if self._count_jobs_sharing_schedule(bot_id, config) > 1 else 0.0
         # Delegate to Runner
-        await self.runner.run_tracking_cycle(bot_id, config, timezone)
+        await self.runner.run_tracking_cycle(bot_id, config, timezone, max_jitter_seconds=max_jitter)
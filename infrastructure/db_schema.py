@@ -1,6 +1,9 @@
+import asyncio
 import logging
+from typing import Awaitable, List, Tuple
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from pymongo import ASCENDING, DESCENDING
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
 
 # --- Collection Constants ---
 COLLECTION_GLOBAL_CONFIGURATIONS = "configurations" # Repurposed for global settings (e.g. token_menu)
@@ -23,90 +26,208 @@ COLLECTION_MEDIA_PROCESSING_JOBS = "media_processing_jobs"
 COLLECTION_MEDIA_PROCESSING_JOBS_HOLDING = "media_processing_jobs_holding"
 COLLECTION_MEDIA_PROCESSING_JOBS_FAILED = "media_processing_jobs_failed"
 
+# Default-named compound index on token_consumption_events before timestamp became DESCENDING.
+# Dropped on startup so inserts don't keep maintaining both versions.
+LEGACY_TOKEN_CONSUMPTION_COMPOUND_INDEX = "user_id_1_bot_id_1_feature_name_1_timestamp_1"
+# Single-field bot_id index on the media processing job collections, superseded by the
+# (bot_id, status, created_at) compound which serves bot_id-only lookups as its prefix.
+LEGACY_MEDIA_PROCESSING_JOBS_BOT_ID_INDEX = "bot_id_1"
+# Full single-field user_id index on audit_logs, superseded by the partial (user_id, timestamp) compound.
+LEGACY_AUDIT_LOGS_USER_ID_INDEX = "user_id_1"
+# Single-field indexes on tracked_group_periods. Every period query leads with bot_id; the
+# (bot_id, group, periodEnd) and (bot_id, periodEnd) compounds serve them all.
+LEGACY_TRACKED_GROUP_PERIODS_INDEXES = [
+    "tracked_group_periods_bot_id_idx",
+    "tracked_group_periods_unique_identifier_idx",
+    "tracked_group_periods_periodEnd_idx",
+]
+
 # --- Index Definitions ---
 
-async def create_indexes(db: AsyncIOMotorDatabase):
+# Default number of concurrent pings used to open pool connections before the index commands
+INDEX_WARMUP_CONNECTIONS = 5
+
+async def _gather_index_tasks(logger: logging.Logger, tasks: List[Tuple[str, Awaitable]]):
+    """
+    Runs the given (collection name, _ensure_indexes coroutine) pairs concurrently and logs each failure by name.
+    Returns the names of the collections whose indexes could not be created.
+    """
+    results = await asyncio.gather(*(task for _, task in tasks), return_exceptions=True)
+    failed = []
+    for (name, _), result in zip(tasks, results):
+        if isinstance(result, Exception):
+            logger.warning(f"Could not create indexes for {name}: {result}")
+            failed.append(name)
+    return failed
+
+async def _ensure_indexes(collection, indexes: List[IndexModel]):
+    """
+    Creates only the indexes whose name is not already present on the collection, in a single
+    createIndexes command. On a warm restart this is just a listIndexes read.
+    Note that an existing index with the same name but different options is left as is.
+    """
+    existing = {index["name"] async for index in collection.list_indexes()}
+    missing = [index for index in indexes if index.document["name"] not in existing]
+    if missing:
+        await collection.create_indexes(missing)
+
+async def _drop_legacy_index(logger: logging.Logger, collection, index_name: str):
+    """Drops an index that has been superseded, ignoring it if it is already gone."""
+    try:
+        await collection.drop_index(index_name)
+        logger.info(f"Dropped legacy index '{index_name}' from {collection.name}.")
+    except OperationFailure:
+        pass # Already dropped or never created
+
+async def create_indexes(db: AsyncIOMotorDatabase, warmup_connections: int = INDEX_WARMUP_CONNECTIONS):
     """
     Creates all required indexes for the application using Motor (Async).
     This should be called by the Backend on startup.
     Gateway should NOT call this, but rely on Backend to manage schema.
+    Each collection's missing indexes are sent as a single createIndexes command, and the
+    collections within a section are handled concurrently.
+    warmup_connections pings are issued concurrently first, so the pool has that many
+    connections open before the concurrent index commands need them.
     """
     logger = logging.getLogger("api.schema")
+
+    # 0. Warm the connection pool
+    results = await asyncio.gather(*(db.command("ping") for _ in range(warmup_connections)), return_exceptions=True)
+    warmup_errors = [result for result in results if isinstance(result, Exception)]
+    if warmup_errors:
+        logger.warning(f"Connection pool warmup: {len(warmup_errors)}/{warmup_connections} pings failed: {warmup_errors[0]}")
     
     # 1. bot_configurations (Replaces deprecated 'configurations')
     try:
         # Unique index on bot_id
-        await db[COLLECTION_BOT_CONFIGURATIONS].create_index([("config_data.bot_id", ASCENDING)], unique=True)
+        await _ensure_indexes(db[COLLECTION_BOT_CONFIGURATIONS], [
+            IndexModel([("config_data.bot_id", ASCENDING)], unique=True),
+        ])
         logger.info(f"Ensured unique index for '{COLLECTION_BOT_CONFIGURATIONS}.config_data.bot_id'.")
     except Exception as e:
         logger.warning(f"Could not create index for {COLLECTION_BOT_CONFIGURATIONS}: {e}")
 
     # 2. Authentication Collections
     try:
-        # Sessions
-        sessions = db[COLLECTION_SESSIONS]
-        await sessions.create_index([("session_id", ASCENDING)], unique=True)
-        await sessions.create_index([("user_id", ASCENDING)])
-        await sessions.create_index([("expires_at", ASCENDING)], expireAfterSeconds=0)
-        logger.info(f"Created indexes for {COLLECTION_SESSIONS}.")
-
-        # Credentials
-        creds = db[COLLECTION_CREDENTIALS]
-        await creds.create_index([("user_id", ASCENDING)], unique=True)
-        logger.info(f"Created indexes for {COLLECTION_CREDENTIALS}.")
-
-        # Audit Logs
-        logs = db[COLLECTION_AUDIT_LOGS]
-        await logs.create_index([("timestamp", ASCENDING)], expireAfterSeconds=2592000) # 30 days
-        await logs.create_index([("user_id", ASCENDING)])
-        await logs.create_index([("event_type", ASCENDING)])
-        logger.info(f"Created indexes for {COLLECTION_AUDIT_LOGS}.")
-
-        # Account Lockouts
-        lockouts = db[COLLECTION_ACCOUNT_LOCKOUTS]
-        await lockouts.create_index([("user_id", ASCENDING)], unique=True, sparse=True)
-        await lockouts.create_index([("ip_address", ASCENDING)], sparse=True)
-        await lockouts.create_index([("locked_until", ASCENDING)], expireAfterSeconds=0, sparse=True)
-        logger.info(f"Created indexes for {COLLECTION_ACCOUNT_LOCKOUTS}.")
+        tasks = [
+            # Sessions
+            (COLLECTION_SESSIONS, _ensure_indexes(db[COLLECTION_SESSIONS], [
+                IndexModel([("session_id", ASCENDING)], unique=True),
+                IndexModel([("user_id", ASCENDING)]),
+                IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+            ])),
+            # Credentials
+            (COLLECTION_CREDENTIALS, _ensure_indexes(db[COLLECTION_CREDENTIALS], [
+                IndexModel([("user_id", ASCENDING)], unique=True),
+            ])),
+            # Audit Logs
+            (COLLECTION_AUDIT_LOGS, _ensure_indexes(db[COLLECTION_AUDIT_LOGS], [
+                IndexModel([("timestamp", ASCENDING)], expireAfterSeconds=2592000), # 30 days
+                # Recent events per user. Anonymous events (e.g. failed logins) store user_id: null
+                # and are kept out of the index.
+                IndexModel(
+                    [("user_id", ASCENDING), ("timestamp", DESCENDING)],
+                    partialFilterExpression={"user_id": {"$type": "string"}},
+                    name="audit_logs_user_timestamp_idx",
+                ),
+                IndexModel([("event_type", ASCENDING)]),
+            ])),
+            # Account Lockouts
+            (COLLECTION_ACCOUNT_LOCKOUTS, _ensure_indexes(db[COLLECTION_ACCOUNT_LOCKOUTS], [
+                IndexModel([("user_id", ASCENDING)], unique=True, sparse=True),
+                IndexModel([("ip_address", ASCENDING)], sparse=True),
+                IndexModel([("locked_until", ASCENDING)], expireAfterSeconds=0, sparse=True),
+            ])),
+        ]
+        failed = await _gather_index_tasks(logger, tasks)
+        if COLLECTION_AUDIT_LOGS not in failed:
+            await _drop_legacy_index(logger, db[COLLECTION_AUDIT_LOGS], LEGACY_AUDIT_LOGS_USER_ID_INDEX)
+        if not failed:
+            logger.info(f"Created indexes for {COLLECTION_SESSIONS}, {COLLECTION_CREDENTIALS}, {COLLECTION_AUDIT_LOGS}, {COLLECTION_ACCOUNT_LOCKOUTS}.")
 
     except Exception as e:
         logger.warning(f"Could not create authentication indexes: {e}")
 
     # 3. Features
     try:
-        await db[COLLECTION_QUEUES].create_index(
-            [("bot_id", ASCENDING), ("provider_name", ASCENDING), ("correspondent_id", ASCENDING), ("id", ASCENDING)],
-            unique=True,
-            name="queues_bot_provider_correspondent_id_unique",
-        )
-        logger.info(f"Ensured unique queue index for {COLLECTION_QUEUES}.")
-
-        for collection_name in [
+        tasks = [
+            (COLLECTION_QUEUES, _ensure_indexes(db[COLLECTION_QUEUES], [
+                IndexModel(
+                    [("bot_id", ASCENDING), ("provider_name", ASCENDING), ("correspondent_id", ASCENDING), ("id", ASCENDING)],
+                    unique=True,
+                    name="queues_bot_provider_correspondent_id_unique",
+                ),
+            ])),
+        ]
+
+        media_collection_names = [
             COLLECTION_MEDIA_PROCESSING_JOBS,
             COLLECTION_MEDIA_PROCESSING_JOBS_HOLDING,
             COLLECTION_MEDIA_PROCESSING_JOBS_FAILED,
-        ]:
-            collection = db[collection_name]
-            await collection.create_index([("bot_id", ASCENDING)])
-            await collection.create_index([("status", ASCENDING)])
-            await collection.create_index([("mime_type", ASCENDING)])
-            await collection.create_index([("guid", ASCENDING)], unique=True)
-            await collection.create_index([("created_at", ASCENDING)])
-        logger.info("Ensured media processing job indexes.")
+        ]
+        for collection_name in media_collection_names:
+            tasks.append((collection_name, _ensure_indexes(db[collection_name], [
+                # Per-bot reaping/promotion: equality on bot_id and status, oldest job first
+                IndexModel(
+                    [("bot_id", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING)],
+                    name="mpj_bot_status_created_idx",
+                ),
+                # Worker claims and pool depth filter on status and mime_type across all bots
+                IndexModel([("status", ASCENDING)]),
+                IndexModel([("mime_type", ASCENDING)]),
+                IndexModel([("guid", ASCENDING)], unique=True),
+                # Janitor staleness sweep
+                IndexModel([("created_at", ASCENDING)]),
+            ])))
 
         # 5. Indexes for Tracked Group Periods
-        await db[COLLECTION_TRACKED_GROUP_PERIODS].create_index([("bot_id", ASCENDING)], name="tracked_group_periods_bot_id_idx")
-        await db[COLLECTION_TRACKED_GROUP_PERIODS].create_index([("tracked_group_unique_identifier", ASCENDING)], name="tracked_group_periods_unique_identifier_idx")
-        await db[COLLECTION_TRACKED_GROUP_PERIODS].create_index([("periodEnd", DESCENDING)], name="tracked_group_periods_periodEnd_idx")
-        logger.info(f"Created indexes for {COLLECTION_TRACKED_GROUP_PERIODS}.")
+        tasks.append((COLLECTION_TRACKED_GROUP_PERIODS, _ensure_indexes(db[COLLECTION_TRACKED_GROUP_PERIODS], [
+            # Per-group period reads and deletes: equality on bot and group, sorted by most recent period
+            IndexModel(
+                [("bot_id", ASCENDING), ("tracked_group_unique_identifier", ASCENDING), ("periodEnd", DESCENDING)],
+                name="tracked_group_periods_bot_group_periodEnd_idx",
+            ),
+            # All periods of a bot sorted by most recent (get_tracked_periods without a group), which the
+            # group compound cannot sort without an in-memory SORT stage
+            IndexModel(
+                [("bot_id", ASCENDING), ("periodEnd", DESCENDING)],
+                name="tracked_group_periods_bot_periodEnd_idx",
+            ),
+        ])))
 
         # 6. Indexes for Group Tracking State
-        await db[COLLECTION_GROUP_TRACKING_STATE].create_index(
-            [("bot_id", ASCENDING), ("group_id", ASCENDING)],
-            unique=True,
-            name="group_tracking_state_bot_group_idx",
-        )
-        logger.info(f"Created indexes for {COLLECTION_GROUP_TRACKING_STATE}.")
+        tasks.append((COLLECTION_GROUP_TRACKING_STATE, _ensure_indexes(db[COLLECTION_GROUP_TRACKING_STATE], [
+            IndexModel(
+                [("bot_id", ASCENDING), ("group_id", ASCENDING)],
+                unique=True,
+                name="group_tracking_state_bot_group_idx",
+            ),
+        ])))
+
+        # 7. Indexes for Tracked Groups (group metadata, upserted per bot/group)
+        tasks.append((COLLECTION_TRACKED_GROUPS, _ensure_indexes(db[COLLECTION_TRACKED_GROUPS], [
+            IndexModel(
+                [("bot_id", ASCENDING), ("group_id", ASCENDING)],
+                unique=True,
+                name="tracked_groups_bot_group_idx",
+            ),
+        ])))
+
+        failed = await _gather_index_tasks(logger, tasks)
+        # Only drop superseded indexes once their replacement exists
+        legacy_drops = [
+            _drop_legacy_index(logger, db[collection_name], LEGACY_MEDIA_PROCESSING_JOBS_BOT_ID_INDEX)
+            for collection_name in media_collection_names
+            if collection_name not in failed
+        ]
+        if COLLECTION_TRACKED_GROUP_PERIODS not in failed:
+            legacy_drops.extend(
+                _drop_legacy_index(logger, db[COLLECTION_TRACKED_GROUP_PERIODS], index_name)
+                for index_name in LEGACY_TRACKED_GROUP_PERIODS_INDEXES
+            )
+        await asyncio.gather(*legacy_drops)
+        if not failed:
+            logger.info("Ensured feature indexes (queues, media processing jobs, group tracking).")
         
     except Exception as e:
         logger.warning(f"Could not create feature indexes: {e}")
@@ -114,15 +235,18 @@ async def create_indexes(db: AsyncIOMotorDatabase):
     # 4. Token Consumption Events
     try:
         token_events = db[COLLECTION_TOKEN_CONSUMPTION]
-        # TTL Index: Expire after 40 days (3456000 seconds)
-        await token_events.create_index([("timestamp", ASCENDING)], expireAfterSeconds=3456000)
-        # Compound Index for aggregation queries
-        await token_events.create_index([
-            ("user_id", ASCENDING),
-            ("bot_id", ASCENDING),
-            ("feature_name", ASCENDING),
-            ("timestamp", ASCENDING)
+        await _ensure_indexes(token_events, [
+            # TTL Index: Expire after 40 days (3456000 seconds). Kept standalone, TTL cannot be compound.
+            IndexModel([("timestamp", ASCENDING)], expireAfterSeconds=3456000),
+            # Compound Index for aggregation queries: equality fields first, then timestamp newest-first
+            IndexModel([
+                ("user_id", ASCENDING),
+                ("bot_id", ASCENDING),
+                ("feature_name", ASCENDING),
+                ("timestamp", DESCENDING)
+            ], name="token_consumption_user_bot_feature_timestamp_idx"),
         ])
+        await _drop_legacy_index(logger, token_events, LEGACY_TOKEN_CONSUMPTION_COMPOUND_INDEX)
         logger.info(f"Created indexes for {COLLECTION_TOKEN_CONSUMPTION}.")
     except Exception as e:
         logger.warning(f"Could not create token consumption indexes: {e}")
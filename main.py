@@ -10,6 +10,7 @@ from services.session_manager import SessionManager
 from features.periodic_group_tracking.service import GroupTracker
 from services.bot_lifecycle_service import BotLifecycleService
 from services.media_processing_service import MediaProcessingService
+from services.model_factory import close_cached_providers
 from utils.json_encoder import CustomJSONResponse
 
 # Import Routers
@@ -66,7 +67,12 @@ async def lifespan(app: FastAPI):
         await global_state.async_message_delivery_queue_manager.start_consumer()
         
         # 3. Initialize GroupTracker
-        global_state.group_tracker = GroupTracker(global_state.db, global_state.chatbot_instances, global_state.async_message_delivery_queue_manager)
+        global_state.group_tracker = GroupTracker(
+            global_state.db,
+            global_state.chatbot_instances,
+            global_state.async_message_delivery_queue_manager,
+            instance_resolver=global_state.get_chatbot_instance_by_bot
+        )
         global_state.group_tracker.start()
 
         # 3.1 Initialize MediaProcessingService
@@ -144,6 +150,16 @@ async def lifespan(app: FastAPI):
             
         global_state.chatbot_instances.clear()
         
+        # Let detached action item extractions finish queuing their items (bounded)
+        if global_state.group_tracker:
+            try:
+                await asyncio.wait_for(global_state.group_tracker.runner.wait_for_pending_extractions(), timeout=30)
+            except asyncio.TimeoutError:
+                logging.warning("API: Pending action item extractions did not finish before shutdown.")
+
+        # Release the HTTP clients of cached LLM providers
+        await close_cached_providers()
+
         # Shutdown GroupTracker
         global_state.shutdown()
         
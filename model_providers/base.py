@@ -5,6 +5,9 @@ from langchain_core.language_models.chat_models import BaseChatModel
 from config_models import BaseModelProviderConfig
 
 class BaseModelProvider(ABC):
+    # Whether the model factory may reuse one instance across calls (keeps HTTP connection pools warm)
+    reuse_instances: bool = True
+
     def __init__(self, config: BaseModelProviderConfig):
         self.config = config
 
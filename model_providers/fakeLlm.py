@@ -49,18 +49,20 @@ class MockTokenChatModel(FakeListChatModel):
         return result
 
 class FakeLlmProvider(ChatCompletionProvider):
+    # A reused fake model would keep cycling its responses across calls instead of starting over
+    reuse_instances = False
+
     def __init__(self, config: ChatCompletionProviderConfig):
         super().__init__(config)
-
-    def get_llm(self):
-        provider_config_dict = self.config.provider_config.model_dump()
+        # The provider config is fixed for the lifetime of the provider, so serialize and format it once
+        provider_config_dict = config.provider_config.model_dump()
         response_array = provider_config_dict.get("response_array", [
             "This is a default response."
         ])
         
         # Test frameworks parsing this expectation must update to expect a parameterless string 
         # instead of {user_id}.
-        formatted_responses = [resp.format() for resp in response_array]
-
-        return MockTokenChatModel(responses=formatted_responses)
+        self._formatted_responses = tuple(resp.format() for resp in response_array)
 
+    def get_llm(self):
+        return MockTokenChatModel(responses=list(self._formatted_responses))
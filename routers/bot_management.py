@@ -25,6 +25,7 @@ from infrastructure.exceptions import (
 )
 from services.session_manager import SessionManager
 from services.ingestion_service import IngestionService
+from services.model_factory import evict_bot_providers
 from features.automatic_bot_reply.service import AutomaticBotReplyService
 from features.kid_phone_safety_tracking.service import KidPhoneSafetyService
 from dependencies import GlobalStateManager, get_global_state
@@ -549,6 +550,8 @@ async def patch_bot_configuration(
                 {"config_data.bot_id": bot_id},
                 {"$set": db_updates}
             )
+            # Cached LLM clients were built from the previous configuration
+            evict_bot_providers(bot_id)
             
         logging.info(f"API: Patched bot {bot_id} by {user_id}")
         return {"status": "success", "bot_id": bot_id, "action": "updated"}
@@ -614,6 +617,7 @@ async def save_bot_configuration(bot_id: str, config: BotConfiguration = Body(..
         query = {"config_data.bot_id": bot_id}
         
         await state.configurations_collection.update_one(query, {"$set": db_document}, upsert=True)
+        evict_bot_providers(bot_id)
         logging.info(f"API: Saved configuration for {bot_id}.")
         return {"status": "success", "bot_id": bot_id}
     except DuplicateKeyError:
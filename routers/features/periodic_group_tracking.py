@@ -1,8 +1,9 @@
 
+import json
 import logging
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from fastapi import APIRouter, HTTPException, Response, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from dependencies import GlobalStateManager, get_global_state
 
 router = APIRouter(
@@ -16,26 +17,46 @@ def ensure_tracker_initialized(state: GlobalStateManager = Depends(get_global_st
     return state
 
 @router.get("/trackedGroupMessages/{bot_id}")
-async def get_all_tracked_messages(bot_id: str, state: GlobalStateManager = Depends(ensure_tracker_initialized)):
+async def get_all_tracked_messages(bot_id: str, include_messages: bool = False, state: GlobalStateManager = Depends(ensure_tracker_initialized)):
     """
-    Get all tracked messages for a user.
+    Get all tracked periods for a user.
+    Listing view: period metadata only (messageCount is kept) unless include_messages=true.
     """
     try:
         # Use History Service
-        results = await state.group_tracker.history.get_tracked_periods(bot_id=bot_id)
+        results = await state.group_tracker.history.get_tracked_periods(bot_id=bot_id, include_messages=include_messages)
         return JSONResponse(content=results)
     except Exception as e:
         logging.error(f"API: Error getting tracked messages for {bot_id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to get tracked messages.")
 
+@router.get("/trackedGroupMessagesStream/{bot_id}")
+async def stream_all_tracked_messages(bot_id: str, include_messages: bool = True, message_limit: Optional[int] = None,
+                                      state: GlobalStateManager = Depends(ensure_tracker_initialized)):
+    """
+    Stream all tracked periods for a user as NDJSON (one period per line).
+    """
+    async def ndjson_lines():
+        try:
+            async for period in state.group_tracker.history.stream_all_user_messages(
+                bot_id, include_messages=include_messages, message_limit=message_limit
+            ):
+                yield json.dumps(period, ensure_ascii=False) + "\n"
+        except Exception as e:
+            # Headers are already sent at this point, so the stream is just cut short
+            logging.error(f"API: Error streaming tracked messages for {bot_id}: {e}")
+
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
 @router.get("/trackedGroupMessages/{bot_id}/{group_id}")
-async def get_group_tracked_messages(bot_id: str, group_id: str, state: GlobalStateManager = Depends(ensure_tracker_initialized)):
+async def get_group_tracked_messages(bot_id: str, group_id: str, include_messages: bool = True, state: GlobalStateManager = Depends(ensure_tracker_initialized)):
     """
     Get tracked messages for a specific group.
+    include_messages=false returns period metadata only.
     """
     try:
         # Use History Service
-        results = await state.group_tracker.history.get_tracked_periods(bot_id=bot_id, group_id=group_id)
+        results = await state.group_tracker.history.get_tracked_periods(bot_id=bot_id, group_id=group_id, include_messages=include_messages)
         return JSONResponse(content=results)
     except Exception as e:
         logging.error(f"API: Error getting tracked messages for {bot_id}/{group_id}: {e}")
@@ -13,6 +13,7 @@ import asyncio
 import uuid
 from services.session_manager import SessionManager
 from services.ingestion_service import IngestionService
+from services.model_factory import evict_bot_providers
 from features.automatic_bot_reply.service import AutomaticBotReplyService
 from features.kid_phone_safety_tracking.service import KidPhoneSafetyService
 
@@ -151,6 +152,9 @@ class BotLifecycleService:
             if media_service and hasattr(media_service, "on_bot_disconnected"):
                  await media_service.on_bot_disconnected(bot_id)
 
+            # Drop the bot's cached LLM clients
+            evict_bot_providers(bot_id)
+
             # 4. Delete Configuration DO NOT DELETE CREDENTIALS HERE
             query = {"config_data.bot_id": bot_id}
             result = await self.global_state.configurations_collection.delete_one(query)
@@ -284,6 +288,7 @@ class BotLifecycleService:
             
             # 4. Evict from memory
             self.global_state.remove_active_bot(bot_id)
+            evict_bot_providers(bot_id)
             
         except Exception as e:
             logging.error(f"LIFECYCLE: Error stopping bot {bot_id}: {e}")
@@ -1,6 +1,7 @@
 import importlib
 import logging
-from typing import Literal, Optional, Type, Union
+from collections import OrderedDict
+from typing import Any, Dict, Literal, Optional, Tuple, Type, Union
 from langchain_core.language_models import BaseChatModel
 
 from config_models import ConfigTier
@@ -17,6 +18,49 @@ logger = logging.getLogger(__name__)
 
 from utils.provider_utils import find_provider_class
 
+# provider_name -> resolved provider class (avoids re-running the module import + class reflection scan)
+_provider_class_cache: Dict[str, Type[BaseModelProvider]] = {}
+
+# (bot_id, feature_name, config_tier) -> (config fingerprint, created provider/LLM), least recently used first.
+# Keeps one long-living client per bot/feature/tier so its HTTP connection pool is reused across calls.
+# A changed configuration (or owner) produces a different fingerprint and replaces the entry;
+# bot stop/delete/config updates evict the bot's entries, and the size bound covers the rest.
+PROVIDER_INSTANCE_CACHE_MAX_SIZE = 256
+_provider_instance_cache: "OrderedDict[Tuple[str, str, str], Tuple[str, Any]]" = OrderedDict()
+
+def evict_bot_providers(bot_id: str):
+    """
+    Drops the cached providers of a bot. The clients are not closed here: ChatOpenAI instances share
+    process-wide default HTTP clients, which close_cached_providers releases on shutdown.
+    """
+    for cache_key in [key for key in _provider_instance_cache if key[0] == bot_id]:
+        del _provider_instance_cache[cache_key]
+
+async def close_cached_providers():
+    """Closes the HTTP clients of all cached providers (shutdown only) and empties the cache."""
+    for _, cached in list(_provider_instance_cache.values()):
+        llm = cached.get_llm() if isinstance(cached, LLMProvider) else cached
+        client = getattr(llm, "root_async_client", None)
+        if client is None:
+            continue
+        try:
+            await client.close()
+        except Exception as e:
+            logger.warning(f"Failed to close model provider client: {e}")
+    _provider_instance_cache.clear()
+
+def _get_provider_class(provider_name: str) -> Type[BaseModelProvider]:
+    ProviderClass = _provider_class_cache.get(provider_name)
+    if ProviderClass is None:
+        provider_module = importlib.import_module(f"model_providers.{provider_name}")
+        ProviderClass = find_provider_class(provider_module, BaseModelProvider)
+
+        if not ProviderClass:
+            raise ImportError(f"Could not find a subclass of BaseModelProvider in model_providers.{provider_name}")
+
+        _provider_class_cache[provider_name] = ProviderClass
+    return ProviderClass
+
 async def create_model_provider(
     bot_id: str,
     feature_name: str,
@@ -36,17 +80,20 @@ async def create_model_provider(
         config = await resolve_model_config(bot_id, config_tier)
         user_id = await resolve_user(bot_id)
         
-        # 2. Dynamically load provider
-        provider_module = importlib.import_module(f"model_providers.{config.provider_name}")
-        ProviderClass = find_provider_class(provider_module, BaseModelProvider)
-        
-        if not ProviderClass:
-            raise ImportError(f"Could not find a subclass of BaseModelProvider in model_providers.{config.provider_name}")
+        # 2. Reuse the provider created for an identical configuration
+        cache_key = (bot_id, feature_name, config_tier)
+        fingerprint = f"{user_id}:{config.model_dump_json()}"
+        cached = _provider_instance_cache.get(cache_key)
+        if cached and cached[0] == fingerprint:
+            _provider_instance_cache.move_to_end(cache_key)
+            return cached[1]
 
-        # 3. Create Provider instance
+        # 3. Dynamically load provider and create instance
+        ProviderClass = _get_provider_class(config.provider_name)
         provider = ProviderClass(config=config)
         
         # 4. Polymorphic tracking attachment
+        cacheable = ProviderClass.reuse_instances
         if isinstance(provider, LLMProvider):
             llm = provider.get_llm()
             
@@ -73,20 +120,31 @@ async def create_model_provider(
                      llm.callbacks = [callback]
             else:
                 logger.warning("create_model_provider: token_consumption_collection is None! Token tracking DISABLED.")
+                # Do not keep an untracked client around once tracking becomes available
+                cacheable = False
 
             # Subtype-specific return: ChatCompletionProvider returns raw LLM,
             # ImageTranscriptionProvider returns the wrapper
             if isinstance(provider, ChatCompletionProvider):
-                return llm
+                result = llm
             else:
-                return provider
+                result = provider
             
         elif isinstance(provider, ImageModerationProvider):
-            return provider
+            result = provider
             
         else:
             raise TypeError(f"Unknown provider type: {type(provider)}")
 
+        if cacheable:
+            _provider_instance_cache[cache_key] = (fingerprint, result)
+            _provider_instance_cache.move_to_end(cache_key)
+            while len(_provider_instance_cache) > PROVIDER_INSTANCE_CACHE_MAX_SIZE:
+                _provider_instance_cache.popitem(last=False)
+        else:
+            _provider_instance_cache.pop(cache_key, None)
+        return result
+
     except Exception as e:
         logger.error(f"Failed to create model provider: {e}")
         raise
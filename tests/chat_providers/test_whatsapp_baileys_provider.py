@@ -127,6 +127,12 @@ class TestBotMessageDetection:
         assert self.provider.is_bot_message("") is False
         assert self.provider.is_bot_message(None) is False
 
+    def test_are_bot_messages_matches_is_bot_message(self):
+        """Test that the batched check returns one flag per ID, in order."""
+        self.provider.sent_message_ids.append(("msg_123", time.time()))
+
+        assert self.provider.are_bot_messages(["unknown_id", "msg_123", "", None]) == [False, True, False, False]
+
     def test_check_and_consume_pending_matches_content(self):
         """Test that pending buffer matches by recipient and content."""
         recipient = "recipient@s.whatsapp.net"
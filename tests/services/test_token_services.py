@@ -79,6 +79,11 @@ class TestTokenServices(unittest.IsolatedAsyncioTestCase):
         self.mock_collection.insert_one.assert_not_called()
 
 class TestModelFactory(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        from services import model_factory
+        model_factory._provider_class_cache.clear()
+        model_factory._provider_instance_cache.clear()
+
     @patch('importlib.import_module')
     @patch('services.model_factory.find_provider_class')
     @patch('services.model_factory.resolve_user')
@@ -118,5 +123,66 @@ class TestModelFactory(unittest.IsolatedAsyncioTestCase):
         self.assertTrue(isinstance(llm.callbacks[0], TokenTrackingCallback))
         self.assertEqual(llm.callbacks[0].feature_name, "feature")
 
+        # Second call with identical config reuses the client (no re-import, no new callback)
+        llm_again = await create_model_provider("bot", "feature", "high")
+        self.assertIs(llm_again, llm)
+        self.assertEqual(len(llm.callbacks), 1)
+        mock_provider_cls.assert_called_once()
+        mock_import.assert_called_once()
+
+        # Changed config builds a new client
+        mock_resolve_config.return_value = ChatCompletionProviderConfig(provider_name="test_provider", provider_config=ChatCompletionProviderSettings(model="test-2"))
+        await create_model_provider("bot", "feature", "high")
+        self.assertEqual(mock_provider_cls.call_count, 2)
+        mock_import.assert_called_once()
+
+    @patch('services.model_factory.resolve_user', new_callable=AsyncMock, return_value="test_user")
+    @patch('services.model_factory.resolve_model_config', new_callable=AsyncMock)
+    @patch('services.model_factory.get_global_state')
+    async def test_cache_eviction_bound_and_shutdown(self, mock_get_state, mock_resolve_config, mock_resolve_user):
+        from services import model_factory
+        from config_models import ChatCompletionProviderConfig, ChatCompletionProviderSettings
+        mock_get_state.return_value.token_consumption_collection = AsyncMock()
+        mock_resolve_config.return_value = ChatCompletionProviderConfig(
+            provider_name="openAi", provider_config=ChatCompletionProviderSettings(model="gpt-test", api_key_source="explicit", api_key="sk-test")
+        )
+
+        llm = await model_factory.create_model_provider("bot1", "feature", "low")
+        await model_factory.create_model_provider("bot2", "feature", "low")
+
+        # Stopping/deleting/reconfiguring a bot evicts only its entries
+        model_factory.evict_bot_providers("bot1")
+        self.assertEqual([key[0] for key in model_factory._provider_instance_cache], ["bot2"])
+        self.assertIsNot(await model_factory.create_model_provider("bot1", "feature", "low"), llm)
+
+        # The least recently used entry goes once the bound is exceeded
+        with patch.object(model_factory, "PROVIDER_INSTANCE_CACHE_MAX_SIZE", 2):
+            await model_factory.create_model_provider("bot3", "feature", "low")
+        self.assertEqual([key[0] for key in model_factory._provider_instance_cache], ["bot1", "bot3"])
+
+        # Shutdown closes the cached clients and empties the cache
+        cached_llms = [entry[1] for entry in model_factory._provider_instance_cache.values()]
+        with patch.object(type(cached_llms[0].root_async_client), "close", new_callable=AsyncMock) as mock_close:
+            await model_factory.close_cached_providers()
+        self.assertEqual(mock_close.await_count, 2)
+        self.assertEqual(len(model_factory._provider_instance_cache), 0)
+
+    @patch('services.model_factory.resolve_user', new_callable=AsyncMock, return_value="test_user")
+    @patch('services.model_factory.resolve_model_config', new_callable=AsyncMock)
+    @patch('services.model_factory.get_global_state')
+    async def test_fake_provider_is_not_reused(self, mock_get_state, mock_resolve_config, mock_resolve_user):
+        """Each extraction gets a fresh fake model that starts from its first response."""
+        from services import model_factory
+        from config_models import ChatCompletionProviderConfig, ChatCompletionProviderSettings
+        mock_get_state.return_value.token_consumption_collection = AsyncMock()
+        config = ChatCompletionProviderConfig(provider_name="fakeLlm", provider_config=ChatCompletionProviderSettings(model="fake"))
+        mock_resolve_config.return_value = config
+
+        first = await model_factory.create_model_provider("bot1", "feature", "low")
+        second = await model_factory.create_model_provider("bot1", "feature", "low")
+
+        self.assertIsNot(first, second)
+        self.assertEqual(len(model_factory._provider_instance_cache), 0)
+
 if __name__ == '__main__':
     unittest.main()
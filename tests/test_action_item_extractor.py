@@ -0,0 +1,187 @@
+import asyncio
+import json
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from unittest.mock import patch, AsyncMock, MagicMock
+import httpx
+from openai import RateLimitError, APIConnectionError
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from features.periodic_group_tracking.extractor import ActionItemExtractor, REFINE_PROMPT, EXTRACTOR_PROMPT_PATH, _is_retryable_llm_error
+
+class TestActionItemExtractorInput(unittest.TestCase):
+    def test_when_matches_per_message_conversion_across_dst(self):
+        """Minute-level formatting reuse must give the same local time as converting every message."""
+        tz = ZoneInfo("America/New_York")
+        # 2024-11-03 05:00 UTC -> 07:00 UTC spans the DST fallback (01:00 EDT happens twice)
+        start_ms = int(datetime(2024, 11, 3, 5, 0, tzinfo=ZoneInfo("UTC")).timestamp() * 1000)
+        messages = [
+            {"originating_time": start_ms + i * 37_000, "sender": {"display_name": "alice"}, "message": f"msg {i}"}
+            for i in range(200)
+        ]
+
+        result = json.loads(ActionItemExtractor()._build_llm_input_json(messages, tz))
+
+        expected = [
+            datetime.fromtimestamp(m["originating_time"] / 1000, tz=tz).strftime('%Y-%m-%d %H:%M')
+            for m in messages
+        ]
+        self.assertEqual([r["when"] for r in result], expected)
+        self.assertEqual(result[0]["sender"], "alice")
+        self.assertEqual(result[5]["content"], "msg 5")
+
+    def test_input_json_is_compact_utf8(self):
+        messages = [{"originating_time": 0, "sender": {"display_name": "דנה"}, "message": "שלום"}]
+
+        result = ActionItemExtractor()._build_llm_input_json(messages, ZoneInfo("UTC"))
+
+        self.assertEqual(result, '[{"when":"1970-01-01 00:00","sender":"דנה","content":"שלום"}]')
+
+class TestActionItemExtractorReuse(unittest.TestCase):
+    def test_chain_is_reused_until_llm_changes(self):
+        extractor = ActionItemExtractor()
+        llm = FakeListChatModel(responses=["[]"])
+
+        chain = extractor._get_chain("bot1", "high", REFINE_PROMPT, llm)
+
+        self.assertIs(extractor._get_chain("bot1", "high", REFINE_PROMPT, llm), chain)
+        self.assertIsNot(extractor._get_chain("bot2", "high", REFINE_PROMPT, llm), chain)
+        # A rebuilt model (e.g. config change in the model factory) gets a new chain
+        self.assertIsNot(extractor._get_chain("bot1", "high", REFINE_PROMPT, FakeListChatModel(responses=["[]"])), chain)
+
+    def test_prompt_file_is_read_once(self):
+        extractor = ActionItemExtractor()
+        with patch.object(type(EXTRACTOR_PROMPT_PATH), 'read_text', return_value="system prompt") as mock_read:
+            self.assertEqual(extractor._read_prompt(EXTRACTOR_PROMPT_PATH), "system prompt")
+            self.assertEqual(extractor._read_prompt(EXTRACTOR_PROMPT_PATH), "system prompt")
+
+        mock_read.assert_called_once()
+
+class TestActionItemExtractorRetry(unittest.IsolatedAsyncioTestCase):
+    def _rate_limit_error(self, retry_after=None):
+        headers = {"retry-after": retry_after} if retry_after else {}
+        response = httpx.Response(429, headers=headers, request=httpx.Request("POST", "https://api.example.com"))
+        return RateLimitError("rate limited", response=response, body=None)
+
+    async def test_retries_transient_errors_honouring_retry_after(self):
+        chain = MagicMock()
+        chain.ainvoke = AsyncMock(side_effect=[self._rate_limit_error("7"), self._rate_limit_error(), "[]"])
+
+        with patch('features.periodic_group_tracking.extractor.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+            result = await ActionItemExtractor()._ainvoke_with_retry(chain, {"input": "x"}, "bot1", "Low")
+
+        self.assertEqual(result, "[]")
+        self.assertEqual(chain.ainvoke.call_count, 3)
+        self.assertEqual(mock_sleep.call_args_list[0][0][0], 7.0)
+
+    async def test_long_retry_after_is_not_waited_out(self):
+        """A Retry-After above the cap re-raises instead of holding the LLM slot."""
+        chain = MagicMock()
+        chain.ainvoke = AsyncMock(side_effect=[self._rate_limit_error("600"), "[]"])
+
+        with patch('features.periodic_group_tracking.extractor.asyncio.sleep', new_callable=AsyncMock) as mock_sleep:
+            with self.assertRaises(RateLimitError):
+                await ActionItemExtractor()._ainvoke_with_retry(chain, {}, "bot1", "Low")
+
+        self.assertEqual(chain.ainvoke.call_count, 1)
+        mock_sleep.assert_not_called()
+
+    async def test_gives_up_after_max_attempts_and_does_not_retry_other_errors(self):
+        chain = MagicMock()
+        chain.ainvoke = AsyncMock(side_effect=self._rate_limit_error())
+        with patch('features.periodic_group_tracking.extractor.asyncio.sleep', new_callable=AsyncMock):
+            with self.assertRaises(RateLimitError):
+                await ActionItemExtractor()._ainvoke_with_retry(chain, {}, "bot1", "Low")
+        self.assertEqual(chain.ainvoke.call_count, 4)
+
+        chain.ainvoke = AsyncMock(side_effect=ValueError("bad request"))
+        with self.assertRaises(ValueError):
+            await ActionItemExtractor()._ainvoke_with_retry(chain, {}, "bot1", "Low")
+        self.assertEqual(chain.ainvoke.call_count, 1)
+
+    def test_errors_are_classified_by_status_and_transport(self):
+        request = httpx.Request("POST", "https://api.example.com")
+        server_error = Exception("unavailable")
+        server_error.status_code = 503
+        bad_request = Exception("bad request")
+        bad_request.status_code = 400
+        self.assertTrue(_is_retryable_llm_error(server_error))
+        self.assertFalse(_is_retryable_llm_error(bad_request))
+        self.assertTrue(_is_retryable_llm_error(httpx.ConnectError("refused", request=request)))
+        self.assertTrue(_is_retryable_llm_error(asyncio.TimeoutError()))
+        # SDK connection errors have no status; the wrapped transport error decides
+        try:
+            try:
+                raise httpx.ReadTimeout("timed out", request=request)
+            except httpx.ReadTimeout as err:
+                raise APIConnectionError(request=request) from err
+        except APIConnectionError as e:
+            self.assertTrue(_is_retryable_llm_error(e))
+        self.assertFalse(_is_retryable_llm_error(ValueError("bad json")))
+
+    async def test_llm_slot_is_released_while_backing_off(self):
+        slots = asyncio.Semaphore(1)
+        chain = MagicMock()
+        chain.ainvoke = AsyncMock(side_effect=[self._rate_limit_error(), "[]"])
+        locked_during_backoff = []
+
+        async def backoff(delay):
+            locked_during_backoff.append(slots.locked())
+
+        with patch('features.periodic_group_tracking.extractor.asyncio.sleep', side_effect=backoff):
+            result = await ActionItemExtractor()._ainvoke_with_retry(chain, {}, "bot1", "Low", slots)
+
+        self.assertEqual(result, "[]")
+        self.assertEqual(locked_during_backoff, [False])
+        self.assertFalse(slots.locked())
+
+class TestActionItemExtractorSignalGate(unittest.IsolatedAsyncioTestCase):
+    def _msg(self, text, identifier="alice"):
+        return {"originating_time": 1000, "sender": {"identifier": identifier, "display_name": identifier}, "message": text}
+
+    def test_low_signal_detection(self):
+        extractor = ActionItemExtractor()
+        self.assertTrue(extractor._is_low_signal([self._msg("ok"), self._msg("👍"), self._msg(None)]))
+        # Bot messages do not count towards the signal
+        self.assertTrue(extractor._is_low_signal([self._msg("Meeting moved, please confirm", identifier="bot_test")]))
+        # Digits may be a time or date
+        self.assertFalse(extractor._is_low_signal([self._msg("at 5?")]))
+        self.assertFalse(extractor._is_low_signal([self._msg("Please send the report")]))
+        # Short imperatives without digits are real tasks
+        self.assertFalse(extractor._is_low_signal([self._msg("Pay the rent")]))
+        self.assertTrue(extractor._is_low_signal([self._msg("ok"), self._msg("lol"), self._msg("👍👍")]))
+        self.assertTrue(extractor._is_low_signal([self._msg("Thank you!"), self._msg("סבבה")]))
+        # Single-word updates and unspaced scripts are not acknowledgements
+        self.assertFalse(extractor._is_low_signal([self._msg("Cancelled!")]))
+        self.assertFalse(extractor._is_low_signal([self._msg("明天下午开会")]))
+
+    async def test_low_signal_window_skips_llm(self):
+        extractor = ActionItemExtractor()
+        with patch('services.model_factory.create_model_provider', new_callable=AsyncMock) as mock_factory:
+            items = await extractor.extract([self._msg("ok"), self._msg("lol")], "test_bot", ZoneInfo("UTC"))
+
+        self.assertEqual(items, [])
+        mock_factory.assert_not_called()
+
+    async def test_short_imperative_reaches_llm(self):
+        extractor = ActionItemExtractor()
+        with patch('services.model_factory.create_model_provider', new_callable=AsyncMock) as mock_factory, \
+             patch('services.resolver.resolve_model_config', new_callable=AsyncMock, side_effect=RuntimeError("no config")):
+            mock_factory.side_effect = RuntimeError("llm reached")
+            items = await extractor.extract([self._msg("Call the vet")], "test_bot", ZoneInfo("UTC"))
+
+        self.assertEqual(items, [])
+        mock_factory.assert_called()
+
+    async def test_single_word_cancellation_is_extracted(self):
+        extractor = ActionItemExtractor()
+        extractor._ainvoke_with_retry = AsyncMock(return_value='[{"task_title": "Meeting cancelled"}]')
+        with patch('services.model_factory.create_model_provider', new_callable=AsyncMock), \
+             patch('services.resolver.resolve_model_config', new_callable=AsyncMock, side_effect=RuntimeError("no config")):
+            items = await extractor.extract([self._msg("Cancelled!")], "test_bot", ZoneInfo("UTC"))
+
+        self.assertEqual(items, [{"task_title": "Meeting cancelled"}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -45,7 +45,7 @@ def test_get_tracked_messages_calls_history_service(client):
         assert data[0]["display_name"] == "Group A"
         
         # Verify call
-        mock_history.get_tracked_periods.assert_called_once_with(bot_id=bot_id)
+        mock_history.get_tracked_periods.assert_called_once_with(bot_id=bot_id, include_messages=False)
         
     finally:
         # Restore
@@ -78,7 +78,33 @@ def test_get_group_tracked_messages_calls_history_service(client):
         assert len(data) == 1
         assert data[0]["display_name"] == "Group B"
         
-        mock_history.get_tracked_periods.assert_called_once_with(bot_id=bot_id, group_id=group_id)
+        mock_history.get_tracked_periods.assert_called_once_with(bot_id=bot_id, group_id=group_id, include_messages=True)
         
     finally:
         global_state.group_tracker = original_tracker
+
+def test_tracked_messages_listing_leaves_out_messages_by_default():
+    """The all-groups listing returns period metadata by default; a single group keeps its messages."""
+    from fastapi import FastAPI
+    from dependencies import get_global_state
+    from routers.features import periodic_group_tracking
+
+    mock_state = MagicMock()
+    mock_state.group_tracker.history.get_tracked_periods = AsyncMock(return_value=[])
+    test_app = FastAPI()
+    test_app.include_router(periodic_group_tracking.router)
+    test_app.dependency_overrides[get_global_state] = lambda: mock_state
+    base = "/api/internal/features/periodic_group_tracking/trackedGroupMessages"
+
+    with TestClient(test_app) as test_client:
+        assert test_client.get(f"{base}/bot1").status_code == 200
+        mock_state.group_tracker.history.get_tracked_periods.assert_awaited_with(bot_id="bot1", include_messages=False)
+
+        assert test_client.get(f"{base}/bot1", params={"include_messages": "true"}).status_code == 200
+        mock_state.group_tracker.history.get_tracked_periods.assert_awaited_with(bot_id="bot1", include_messages=True)
+
+        assert test_client.get(f"{base}/bot1/g1").status_code == 200
+        mock_state.group_tracker.history.get_tracked_periods.assert_awaited_with(bot_id="bot1", group_id="g1", include_messages=True)
+
+        assert test_client.get(f"{base}/bot1/g1", params={"include_messages": "false"}).status_code == 200
+        mock_state.group_tracker.history.get_tracked_periods.assert_awaited_with(bot_id="bot1", group_id="g1", include_messages=False)
@@ -1,7 +1,9 @@
 import unittest
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from features.periodic_group_tracking.cron_window import CronWindowCalculator
+from unittest.mock import patch
+from croniter import croniter
+from features.periodic_group_tracking.cron_window import CronWindowCalculator, CachedCroniter
 
 class TestCronWindowCalculator(unittest.TestCase):
     def setUp(self):
@@ -210,5 +212,54 @@ class TestCronWindowCalculator(unittest.TestCase):
         self.assertEqual(start.astimezone(ZoneInfo("UTC")), datetime(2024, 11, 3, 5, 30, 0, tzinfo=ZoneInfo("UTC")))
 
 
+    # --- Cached expression parsing ---
+    def test_cached_croniter_parses_expression_once(self):
+        """Repeated windows for the same cron string reuse the parsed expression and match croniter."""
+        cron = "0 9 * * 1#2"
+        start = datetime(2025, 3, 1, 0, 0, 0, tzinfo=ZoneInfo("UTC"))
+        CachedCroniter._expand_cache.pop((cron, None, False), None)
+
+        with patch.object(croniter, '_expand', wraps=croniter._expand) as mock_expand:
+            for _ in range(3):
+                cached = CachedCroniter(cron, start)
+                self.assertEqual(cached.get_next(datetime), croniter(cron, start).get_next(datetime))
+                self.assertTrue(CachedCroniter.match(cron, datetime(2025, 3, 10, 9, 0, 0, tzinfo=ZoneInfo("UTC"))))
+
+        # One parse through the cache, the rest from the plain croniter comparisons
+        self.assertEqual(mock_expand.call_count, 1 + 3)
+
+    def test_cached_croniter_override_is_used(self):
+        """Guards the private _expand override against croniter upgrades changing how it is called."""
+        cron = "15 6 * * 2-4"
+        start = datetime(2025, 3, 1, 0, 0, 0, tzinfo=ZoneInfo("UTC"))
+        CachedCroniter._expand_cache.pop((cron, None, False), None)
+
+        with patch.object(CachedCroniter, '_expand', wraps=CachedCroniter._expand) as mock_override:
+            cached = CachedCroniter(cron, start)
+        mock_override.assert_called()
+        self.assertIn((cron, None, False), CachedCroniter._expand_cache)
+
+        # A cached expansion gives the same schedule as a fresh croniter
+        cached_again = CachedCroniter(cron, start)
+        plain = croniter(cron, start)
+        for _ in range(5):
+            expected = plain.get_next(datetime)
+            self.assertEqual(cached.get_next(datetime), expected)
+            self.assertEqual(cached_again.get_next(datetime), expected)
+
+
+    # --- DST fast path ---
+    def test_no_dst_transition_skips_wiggle_checks(self):
+        """Windows without a UTC offset change return croniter's answer without the DST match checks."""
+        cron = "0 * * * *"
+        now = datetime(2025, 1, 15, 10, 5, 0, tzinfo=ZoneInfo("America/New_York"))
+
+        with patch.object(CachedCroniter, 'match', wraps=CachedCroniter.match) as mock_match:
+            start, end = self.calculator.calculate_window(cron, "America/New_York", now)
+
+        self.assertEqual(end, datetime(2025, 1, 15, 10, 0, 0, tzinfo=ZoneInfo("America/New_York")))
+        self.assertEqual(start, datetime(2025, 1, 15, 9, 0, 0, tzinfo=ZoneInfo("America/New_York")))
+        mock_match.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,128 @@
+import unittest
+from unittest.mock import MagicMock, AsyncMock
+
+from infrastructure import db_schema
+
+class TestCreateIndexes(unittest.IsolatedAsyncioTestCase):
+    async def test_failed_index_does_not_block_the_rest(self):
+        """A collection whose createIndexes fails is logged by name while the others in its section still run."""
+        collections = {}
+
+        def get_collection(name):
+            if name not in collections:
+                collection = MagicMock()
+                if name == db_schema.COLLECTION_AUDIT_LOGS:
+                    collection.create_indexes = AsyncMock(side_effect=Exception("boom"))
+                else:
+                    collection.create_indexes = AsyncMock()
+                collection.create_index = AsyncMock()
+                collection.drop_index = AsyncMock()
+                collections[name] = collection
+            return collections[name]
+
+        db = MagicMock()
+        db.__getitem__.side_effect = get_collection
+        db.command = AsyncMock()
+
+        with self.assertLogs("api.schema", level="WARNING") as logs:
+            await db_schema.create_indexes(db)
+
+        self.assertTrue(any(db_schema.COLLECTION_AUDIT_LOGS in line for line in logs.output))
+        # The legacy index is kept while its replacement could not be created
+        collections[db_schema.COLLECTION_AUDIT_LOGS].drop_index.assert_not_awaited()
+        audit_models = collections[db_schema.COLLECTION_AUDIT_LOGS].create_indexes.await_args.args[0]
+        user_index = [model.document for model in audit_models if model.document["name"] == "audit_logs_user_timestamp_idx"][0]
+        self.assertEqual(user_index["partialFilterExpression"], {"user_id": {"$type": "string"}})
+        # One batched command per collection, carrying all of its index specs
+        sessions = collections[db_schema.COLLECTION_SESSIONS].create_indexes
+        sessions.assert_awaited_once()
+        self.assertEqual(len(sessions.await_args.args[0]), 3)
+        collections[db_schema.COLLECTION_ACCOUNT_LOCKOUTS].create_indexes.assert_awaited_once()
+        media_failed = collections[db_schema.COLLECTION_MEDIA_PROCESSING_JOBS_FAILED].create_indexes
+        media_failed.assert_awaited_once()
+        self.assertEqual(len(media_failed.await_args.args[0]), 5)
+        self.assertIn("mpj_bot_status_created_idx", [model.document.get("name") for model in media_failed.await_args.args[0]])
+        collections[db_schema.COLLECTION_MEDIA_PROCESSING_JOBS_FAILED].drop_index.assert_awaited_once_with(
+            db_schema.LEGACY_MEDIA_PROCESSING_JOBS_BOT_ID_INDEX
+        )
+        periods = collections[db_schema.COLLECTION_TRACKED_GROUP_PERIODS]
+        period_keys = {model.document["name"]: model.document["key"] for model in periods.create_indexes.await_args.args[0]}
+        self.assertEqual(sorted(period_keys), ["tracked_group_periods_bot_group_periodEnd_idx", "tracked_group_periods_bot_periodEnd_idx"])
+        # The bot-wide listing sorts by periodEnd without a group equality
+        self.assertEqual(list(period_keys["tracked_group_periods_bot_periodEnd_idx"].items()), [("bot_id", 1), ("periodEnd", -1)])
+        self.assertEqual(
+            sorted(call.args[0] for call in periods.drop_index.await_args_list),
+            sorted(db_schema.LEGACY_TRACKED_GROUP_PERIODS_INDEXES),
+        )
+
+    async def test_token_consumption_compound_index_is_timestamp_descending(self):
+        collection = MagicMock()
+        collection.create_index = AsyncMock()
+        collection.create_indexes = AsyncMock()
+        collection.drop_index = AsyncMock()
+        db = MagicMock()
+        db.__getitem__.return_value = collection
+        db.command = AsyncMock()
+
+        await db_schema.create_indexes(db)
+
+        token_models = [
+            call.args[0] for call in collection.create_indexes.await_args_list
+            if any(model.document.get("name") == "token_consumption_user_bot_feature_timestamp_idx" for model in call.args[0])
+        ][0]
+        keys = [model.document["key"] for model in token_models]
+        self.assertIn({"timestamp": 1}, keys)
+        self.assertIn({"user_id": 1, "bot_id": 1, "feature_name": 1, "timestamp": -1}, keys)
+        collection.drop_index.assert_any_await(db_schema.LEGACY_TOKEN_CONSUMPTION_COMPOUND_INDEX)
+
+    async def test_pool_is_warmed_before_index_commands(self):
+        calls = []
+        collection = MagicMock()
+        collection.create_index = AsyncMock(side_effect=lambda *args, **kwargs: calls.append("create_index"))
+        collection.create_indexes = AsyncMock(side_effect=lambda *args, **kwargs: calls.append("create_indexes"))
+        collection.drop_index = AsyncMock()
+        db = MagicMock()
+        db.__getitem__.return_value = collection
+        db.command = AsyncMock(side_effect=lambda *args, **kwargs: calls.append("ping"))
+
+        await db_schema.create_indexes(db, warmup_connections=3)
+
+        self.assertEqual(calls[:3], ["ping"] * 3)
+        self.assertNotIn("ping", calls[3:])
+        db.command.assert_awaited_with("ping")
+
+    async def test_existing_indexes_are_not_recreated(self):
+        """Only index names missing from listIndexes are sent to createIndexes."""
+        class ListIndexesCursor:
+            def __init__(self, names):
+                self._names = iter(names)
+
+            def __aiter__(self):
+                return self
+
+            async def __anext__(self):
+                try:
+                    return {"name": next(self._names)}
+                except StopIteration:
+                    raise StopAsyncIteration
+
+        sessions = MagicMock()
+        sessions.list_indexes = MagicMock(return_value=ListIndexesCursor(["_id_", "session_id_1", "user_id_1"]))
+        sessions.create_indexes = AsyncMock()
+
+        await db_schema._ensure_indexes(sessions, [
+            db_schema.IndexModel([("session_id", db_schema.ASCENDING)], unique=True),
+            db_schema.IndexModel([("user_id", db_schema.ASCENDING)]),
+            db_schema.IndexModel([("expires_at", db_schema.ASCENDING)], expireAfterSeconds=0),
+        ])
+
+        sessions.create_indexes.assert_awaited_once()
+        self.assertEqual([model.document["name"] for model in sessions.create_indexes.await_args.args[0]], ["expires_at_1"])
+
+        sessions.list_indexes = MagicMock(return_value=ListIndexesCursor(["_id_", "session_id_1"]))
+        sessions.create_indexes.reset_mock()
+        await db_schema._ensure_indexes(sessions, [db_schema.IndexModel([("session_id", db_schema.ASCENDING)], unique=True)])
+        sessions.create_indexes.assert_not_awaited()
+
+if __name__ == '__main__':
+    unittest.main()
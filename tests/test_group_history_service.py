@@ -0,0 +1,242 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, AsyncMock, patch
+from pymongo.errors import BulkWriteError
+
+from features.periodic_group_tracking.history_service import GroupHistoryService, _compress_messages, RECENT_MESSAGE_LOOKBACK_PERIODS
+
+class _AsyncCursor:
+    def __init__(self, docs):
+        self._docs = list(docs)
+        self.calls = []
+
+    def sort(self, *args, **kwargs):
+        self.calls.append(("sort", args))
+        return self
+
+    def limit(self, *args, **kwargs):
+        self.calls.append(("limit", args))
+        return self
+
+    def skip(self, *args, **kwargs):
+        self.calls.append(("skip", args))
+        return self
+
+    def __aiter__(self):
+        self._iter = iter(self._docs)
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class TestGroupHistoryService(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.collections = {}
+        db = MagicMock()
+        db.__getitem__.side_effect = lambda name: self.collections.setdefault(name, MagicMock())
+        self.service = GroupHistoryService(db)
+        self.service.tracked_groups_collection.find_one = AsyncMock(
+            return_value={"bot_id": "bot1", "group_id": "g1", "display_name": "Group"}
+        )
+        self.periods = self.service.tracked_group_periods_collection
+        self.periods.find.return_value = _AsyncCursor([{"_id": 1, "messageCount": 3}])
+
+    async def test_default_fetches_full_documents(self):
+        await self.service.get_group_messages("bot1", "g1")
+        self.assertIsNone(self.periods.find.call_args[0][1])
+
+    def test_periods_collection_reads_aware_datetimes(self):
+        codec_options = self.service.db.get_collection.call_args[1]["codec_options"]
+        self.assertTrue(codec_options.tz_aware)
+
+    async def test_metadata_only_excludes_messages(self):
+        result = await self.service.get_group_messages("bot1", "g1", include_messages=False)
+        self.assertEqual(self.periods.find.call_args[0][1], {"messages": 0, "messages_zstd": 0})
+        self.assertEqual(result["periods"][0]["messageCount"], 3)
+
+    async def test_tracked_periods_listing_can_skip_messages(self):
+        self.service.tracked_groups_collection.find.return_value = _AsyncCursor([])
+
+        periods = await self.service.get_tracked_periods("bot1", include_messages=False)
+
+        self.assertEqual(self.periods.find.call_args[0][1], {"messages": 0, "messages_zstd": 0})
+        self.assertEqual(periods[0]["messageCount"], 3)
+
+    async def test_message_limit_slices_on_server(self):
+        await self.service.get_group_messages("bot1", "g1", message_limit=20)
+        self.assertEqual(self.periods.find.call_args[0][1], {"messages": {"$slice": -20}})
+
+    async def test_stream_all_user_messages_yields_periods_across_groups(self):
+        self.service.tracked_groups_collection.find.return_value = _AsyncCursor([
+            {"bot_id": "bot1", "group_id": "g1", "display_name": "One"},
+            {"bot_id": "bot1", "group_id": "g2", "display_name": "Two"},
+        ])
+        self.periods.find.side_effect = [
+            _AsyncCursor([{"_id": 1, "tracked_group_unique_identifier": "g1"}]),
+            _AsyncCursor([{"_id": 2, "tracked_group_unique_identifier": "g2"}, {"_id": 3, "tracked_group_unique_identifier": "g2"}]),
+        ]
+
+        periods = [p async for p in self.service.stream_all_user_messages("bot1", include_messages=False)]
+
+        self.assertEqual([p["_id"] for p in periods], ["1", "2", "3"])
+        self.assertEqual([p["display_name"] for p in periods], ["One", "Two", "Two"])
+
+    async def test_get_all_user_messages_uses_limited_finds_per_group(self):
+        self.service.tracked_groups_collection.find.return_value = _AsyncCursor([
+            {"bot_id": "bot1", "group_id": "g1", "display_name": "One"},
+            {"bot_id": "bot1", "group_id": "g2", "display_name": "Two"},
+        ])
+        cursors = {
+            "g1": _AsyncCursor([{"_id": 1, "tracked_group_unique_identifier": "g1"}, {"_id": 2, "tracked_group_unique_identifier": "g1"}]),
+            "g2": _AsyncCursor([]),
+        }
+        for cursor in cursors.values():
+            cursor.limit = MagicMock(return_value=cursor)
+        self.periods.find.side_effect = lambda query, projection: cursors[query["tracked_group_unique_identifier"]]
+        self.periods.aggregate = MagicMock()
+
+        result = await self.service.get_all_user_messages("bot1", last_periods=2, include_messages=False)
+
+        self.periods.aggregate.assert_not_called()
+        self.assertEqual(self.periods.find.call_count, 2)
+        self.assertEqual(self.periods.find.call_args[0][1], {"messages": 0, "messages_zstd": 0})
+        cursors["g1"].limit.assert_called_once_with(2)
+        self.assertEqual([[p["_id"] for p in g["periods"]] for g in result], [["1", "2"], []])
+        self.assertEqual(result[0]["periods"][0]["display_name"], "One")
+
+    async def test_get_all_user_messages_without_limit_uses_one_find(self):
+        self.service.tracked_groups_collection.find.return_value = _AsyncCursor([
+            {"bot_id": "bot1", "group_id": "g1", "display_name": "One"},
+            {"bot_id": "bot1", "group_id": "g2", "display_name": "Two"},
+        ])
+        self.periods.find.return_value = _AsyncCursor([
+            {"_id": 1, "tracked_group_unique_identifier": "g1"},
+            {"_id": 2, "tracked_group_unique_identifier": "g2"},
+        ])
+
+        result = await self.service.get_all_user_messages("bot1", message_limit=5)
+
+        self.periods.find.assert_called_once()
+        query, projection = self.periods.find.call_args[0]
+        self.assertEqual(query["tracked_group_unique_identifier"], {"$in": ["g1", "g2"]})
+        self.assertEqual(projection, {"messages": {"$slice": -5}})
+        self.assertEqual([[p["_id"] for p in g["periods"]] for g in result], [["1"], ["2"]])
+
+    async def test_delete_all_user_messages_last_periods_in_one_round_trip(self):
+        self.periods.aggregate = MagicMock(return_value=_AsyncCursor([{"_id": 1}, {"_id": 2}]))
+        self.periods.delete_many = AsyncMock(return_value=MagicMock(deleted_count=2))
+
+        deleted = await self.service.delete_all_user_messages("bot1", last_periods=1)
+
+        self.assertEqual(deleted, 2)
+        self.periods.delete_many.assert_awaited_once_with({"_id": {"$in": [1, 2]}})
+        pipeline = self.periods.aggregate.call_args[0][0]
+        # Messages are projected away before the window stage ranks the periods
+        self.assertEqual(pipeline[1], {"$project": {"tracked_group_unique_identifier": 1, "periodEnd": 1}})
+        self.assertIn("$setWindowFields", pipeline[2])
+        self.assertTrue(self.periods.aggregate.call_args[1]["allowDiskUse"])
+        self.service.tracked_groups_collection.find.assert_not_called()
+
+    async def _save(self, group_id, end_ts=2000, bot_id="bot1"):
+        await self.service.save_tracking_result(
+            bot_id=bot_id, config_group_id=group_id, config_display_name=f"Group {group_id}",
+            config_schedule="0 * * * *", messages=[{"message": "hi"}], start_ts=1000, end_ts=end_ts,
+            alternate_identifiers_set=set()
+        )
+
+    async def test_concurrent_saves_are_written_in_one_batch(self):
+        for collection in (self.service.tracked_groups_collection, self.service.tracking_state_collection):
+            collection.bulk_write = AsyncMock()
+        self.periods.insert_many = AsyncMock()
+
+        with patch('features.periodic_group_tracking.history_service.PERIOD_WRITE_FLUSH_DELAY_SECONDS', 0):
+            await asyncio.gather(self._save("g1"), self._save("g2"), self._save("g3", bot_id="bot2"))
+
+        self.service.tracked_groups_collection.bulk_write.assert_awaited_once()
+        self.periods.insert_many.assert_awaited_once()
+        self.service.tracking_state_collection.bulk_write.assert_awaited_once()
+        docs = self.periods.insert_many.call_args[0][0]
+        self.assertEqual([d["tracked_group_unique_identifier"] for d in docs], ["g1", "g2", "g3"])
+        self.assertIsNotNone(docs[0]["createdAt"].tzinfo)
+        self.assertEqual(len(self.service.tracking_state_collection.bulk_write.call_args[0][0]), 3)
+        self.assertEqual([d["bot_id"] for d in docs], ["bot1", "bot1", "bot2"])
+        self.assertEqual(self.service._pending_writes, [])
+
+    async def test_failed_period_insert_skips_state_and_raises(self):
+        self.service.tracked_groups_collection.bulk_write = AsyncMock()
+        self.service.tracking_state_collection.bulk_write = AsyncMock()
+        self.periods.insert_many = AsyncMock(side_effect=Exception("write failed"))
+
+        with patch('features.periodic_group_tracking.history_service.PERIOD_WRITE_FLUSH_DELAY_SECONDS', 0):
+            with self.assertRaises(Exception):
+                await self._save("g1")
+
+        # Last run must not advance, so the window is retried on the next run
+        self.service.tracking_state_collection.bulk_write.assert_not_called()
+
+    async def test_failed_insert_of_one_bot_does_not_fail_other_bots(self):
+        self.service.tracked_groups_collection.bulk_write = AsyncMock()
+        self.service.tracking_state_collection.bulk_write = AsyncMock()
+        self.periods.insert_many = AsyncMock(side_effect=BulkWriteError({
+            "writeErrors": [{"index": 2, "code": 11000, "errmsg": "duplicate key"}],
+            "writeConcernErrors": [], "nInserted": 2,
+        }))
+        self.service.compress_old_periods = AsyncMock()
+
+        with patch('features.periodic_group_tracking.history_service.PERIOD_WRITE_FLUSH_DELAY_SECONDS', 0):
+            results = await asyncio.gather(
+                self._save("g1"), self._save("g2"), self._save("g3", bot_id="bot2"), return_exceptions=True
+            )
+        await asyncio.sleep(0)
+
+        self.assertEqual(results[:2], [None, None])
+        self.assertIsInstance(results[2], BulkWriteError)
+        # Only the stored periods advance their last run
+        state_ops = self.service.tracking_state_collection.bulk_write.call_args[0][0]
+        self.assertEqual([op._filter["group_id"] for op in state_ops], ["g1", "g2"])
+        self.service.compress_old_periods.assert_awaited_once_with("bot1", {"g1", "g2"})
+
+    async def test_compress_old_periods_replaces_messages_with_blob(self):
+        messages = [{"message": "hello", "provider_message_id": "m1"}]
+        self.periods.find.return_value = _AsyncCursor([{"_id": "p_old", "messages": messages}])
+        self.periods.bulk_write = AsyncMock()
+
+        await self.service.compress_old_periods("bot1", {"g1"})
+
+        update = self.periods.bulk_write.call_args[0][0][0]
+        self.assertEqual(update._filter, {"_id": "p_old"})
+        self.assertIsNone(update._doc["$set"]["messages"])
+        compressed_doc = {"_id": 1, "messages": None, "messages_zstd": update._doc["$set"]["messages_zstd"]}
+        self.periods.find.return_value = _AsyncCursor([compressed_doc])
+
+        result = await self.service.get_group_messages("bot1", "g1")
+
+        self.assertEqual(result["periods"][0]["messages"], messages)
+        self.assertNotIn("messages_zstd", result["periods"][0])
+
+    async def test_compress_old_periods_reads_only_the_period_leaving_the_look_back(self):
+        cursor = _AsyncCursor([{"_id": "p_done", "messages": None}])
+        self.periods.find.return_value = cursor
+        self.periods.bulk_write = AsyncMock()
+
+        await self.service.compress_old_periods("bot1", {"g1"})
+
+        # No filter on the messages field, so the skip walks the group's index keys only
+        self.assertEqual(self.periods.find.call_args[0][0], {"bot_id": "bot1", "tracked_group_unique_identifier": "g1"})
+        self.assertEqual(cursor.calls, [("sort", ("periodEnd", -1)), ("skip", (RECENT_MESSAGE_LOOKBACK_PERIODS,)), ("limit", (1,))])
+        # An already compressed period is not rewritten
+        self.periods.bulk_write.assert_not_called()
+
+    async def test_compressed_period_honours_message_limit(self):
+        messages = [{"message": str(i)} for i in range(5)]
+        self.periods.find.return_value = _AsyncCursor([{"_id": 1, "messages": None, "messages_zstd": _compress_messages(messages)}])
+
+        result = await self.service.get_group_messages("bot1", "g1", message_limit=2)
+
+        self.assertEqual(result["periods"][0]["messages"], messages[-2:])
+
+if __name__ == '__main__':
+    unittest.main()
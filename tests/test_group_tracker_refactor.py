@@ -48,3 +48,116 @@ class TestGroupTrackerRefactor(unittest.TestCase):
              
              tracker.shutdown()
              tracker.scheduler.shutdown.assert_called_once()
+
+    def test_update_jobs_uses_scheduler_as_source_of_truth(self):
+        """Verify update_jobs replaces a bot's jobs based on the scheduler job store only."""
+        from config_models import PeriodicGroupTrackingConfig
+
+        with unittest.mock.patch('features.periodic_group_tracking.history_service.AsyncIOMotorDatabase') as mock_db:
+             tracker = GroupTracker(mock_db, {}, MagicMock())
+             configs = [
+                 PeriodicGroupTrackingConfig(groupIdentifier=g, displayName=g, cronTrackingSchedule="0 * * * *")
+                 for g in ("g1", "g2")
+             ]
+
+             tracker.update_jobs("bot1", configs)
+             tracker.update_jobs("bot2", configs[:1])
+             self.assertEqual(sorted(j.id for j in tracker.scheduler.get_jobs()), ["bot1_g1", "bot1_g2", "bot2_g1"])
+
+             tracker.update_jobs("bot1", configs[1:])
+             self.assertEqual(sorted(j.id for j in tracker.scheduler.get_jobs()), ["bot1_g2", "bot2_g1"])
+
+             tracker.stop_tracking_jobs("bot1")
+             self.assertEqual([j.id for j in tracker.scheduler.get_jobs()], ["bot2_g1"])
+
+    def test_jitter_only_when_tick_is_shared(self):
+        """Verify a start jitter is requested only when other jobs share the cron schedule."""
+        import asyncio
+        from unittest.mock import AsyncMock
+        from config_models import PeriodicGroupTrackingConfig
+        from features.periodic_group_tracking.service import SHARED_TICK_JITTER_SECONDS
+
+        with unittest.mock.patch('features.periodic_group_tracking.history_service.AsyncIOMotorDatabase') as mock_db:
+             tracker = GroupTracker(mock_db, {}, MagicMock())
+             tracker.runner.run_tracking_cycle = AsyncMock()
+             hourly = PeriodicGroupTrackingConfig(groupIdentifier="g1", displayName="g1", cronTrackingSchedule="0 * * * *")
+             daily = PeriodicGroupTrackingConfig(groupIdentifier="g2", displayName="g2", cronTrackingSchedule="0 18 * * *")
+
+             tracker.update_jobs("bot1", [hourly, daily])
+             asyncio.run(tracker.track_group_context("bot1", hourly))
+             self.assertEqual(tracker.runner.run_tracking_cycle.call_args[1]["max_jitter_seconds"], 0.0)
+
+             tracker.update_jobs("bot2", [hourly])
+             asyncio.run(tracker.track_group_context("bot1", hourly))
+             self.assertEqual(tracker.runner.run_tracking_cycle.call_args[1]["max_jitter_seconds"], SHARED_TICK_JITTER_SECONDS)
+
+             # Counted per normalized schedule and timezone, kept in step with removals
+             tracker.stop_tracking_jobs("bot2")
+             spaced = PeriodicGroupTrackingConfig(groupIdentifier="g3", displayName="g3", cronTrackingSchedule="0  *  * * *")
+             tracker.update_jobs("bot3", [spaced], timezone="Asia/Jerusalem")
+             asyncio.run(tracker.track_group_context("bot1", hourly))
+             self.assertEqual(tracker.runner.run_tracking_cycle.call_args[1]["max_jitter_seconds"], 0.0)
+
+             tracker.update_jobs("bot3", [spaced])
+             asyncio.run(tracker.track_group_context("bot1", hourly))
+             self.assertEqual(tracker.runner.run_tracking_cycle.call_args[1]["max_jitter_seconds"], SHARED_TICK_JITTER_SECONDS)
+
+    def test_cron_interval_is_memoized_per_expression(self):
+        """Verify the max cron interval is computed once per expression and covers uneven gaps."""
+        from config_models import PeriodicGroupTrackingConfig
+
+        with unittest.mock.patch('features.periodic_group_tracking.history_service.AsyncIOMotorDatabase') as mock_db:
+             tracker = GroupTracker(mock_db, {}, MagicMock())
+             weekdays = PeriodicGroupTrackingConfig(groupIdentifier="g1", displayName="g1", cronTrackingSchedule="0 9 * * 1-5")
+
+             # Friday -> Monday is the longest gap, regardless of the current weekday
+             self.assertEqual(tracker._calculate_max_interval([weekdays]), 3 * 86400 + 900)
+             with unittest.mock.patch('features.periodic_group_tracking.service.CachedCroniter') as mock_croniter:
+                 self.assertEqual(tracker._calculate_max_interval([weekdays, weekdays]), 3 * 86400 + 900)
+                 mock_croniter.assert_not_called()
+
+    def test_late_jobs_are_not_dropped(self):
+        """Verify jobs firing late on a busy tick still run once instead of being skipped as missed."""
+        import asyncio
+        from config_models import PeriodicGroupTrackingConfig
+        from features.periodic_group_tracking.service import JOB_MISFIRE_GRACE_SECONDS
+
+        with unittest.mock.patch('features.periodic_group_tracking.history_service.AsyncIOMotorDatabase') as mock_db:
+             tracker = GroupTracker(mock_db, {}, MagicMock())
+             config = PeriodicGroupTrackingConfig(groupIdentifier="g1", displayName="g1", cronTrackingSchedule="0 * * * *")
+
+             async def add_job():
+                 # Job defaults are applied once the job reaches a running scheduler's job store
+                 tracker.start()
+                 tracker.update_jobs("bot1", [config])
+                 job = tracker.scheduler.get_job("bot1_g1")
+                 tracker.shutdown()
+                 return job
+
+             job = asyncio.run(add_job())
+             self.assertEqual(job.misfire_grace_time, JOB_MISFIRE_GRACE_SECONDS)
+             self.assertTrue(job.coalesce)
+             self.assertEqual(job.max_instances, 1)
+
+    def test_update_jobs_only_touches_changed_groups(self):
+        """Verify unchanged jobs are kept and only added/changed/removed groups hit the scheduler."""
+        from config_models import PeriodicGroupTrackingConfig
+
+        with unittest.mock.patch('features.periodic_group_tracking.history_service.AsyncIOMotorDatabase') as mock_db:
+             tracker = GroupTracker(mock_db, {}, MagicMock())
+             g1 = PeriodicGroupTrackingConfig(groupIdentifier="g1", displayName="g1", cronTrackingSchedule="0 * * * *")
+             g2 = PeriodicGroupTrackingConfig(groupIdentifier="g2", displayName="g2", cronTrackingSchedule="0 * * * *")
+             g2_changed = PeriodicGroupTrackingConfig(groupIdentifier="g2", displayName="g2", cronTrackingSchedule="0 18 * * *")
+             g3 = PeriodicGroupTrackingConfig(groupIdentifier="g3", displayName="g3", cronTrackingSchedule="0 * * * *")
+             tracker.update_jobs("bot1", [g1, g2])
+             g1_job = tracker.scheduler.get_job("bot1_g1")
+
+             with unittest.mock.patch.object(tracker.scheduler, 'add_job', wraps=tracker.scheduler.add_job) as mock_add:
+                 tracker.update_jobs("bot1", [g1, g2_changed, g3])
+                 self.assertEqual(sorted(c.kwargs["id"] for c in mock_add.call_args_list), ["bot1_g2", "bot1_g3"])
+
+             self.assertIs(tracker.scheduler.get_job("bot1_g1"), g1_job)
+             self.assertEqual(tracker.scheduler.get_job("bot1_g2").args[1].cronTrackingSchedule, "0 18 * * *")
+
+             tracker.update_jobs("bot1", [g3])
+             self.assertEqual([j.id for j in tracker.scheduler.get_jobs()], ["bot1_g3"])
@@ -1,4 +1,5 @@
 
+import asyncio
 import unittest
 from unittest.mock import MagicMock, AsyncMock, patch
 from datetime import datetime
@@ -44,16 +45,26 @@ class TestGroupTrackingRunner(unittest.IsolatedAsyncioTestCase):
         self.mock_session.provider_instance = AsyncMock()
         # FIX: is_bot_message is synchronous
         self.mock_session.provider_instance.is_bot_message = MagicMock(return_value=False)
+        self.mock_session.provider_instance.are_bot_messages = MagicMock(side_effect=lambda ids: [False] * len(ids))
         self.mock_session.provider_instance.is_connected = True
         
         # FIX: Mock Config Structure deeply
         self.mock_session.config = MagicMock()
         self.mock_session.config.configurations.llm_provider_config = MagicMock()
         self.mock_session.config.configurations.user_details.language_code = "en"
+        self.mock_session.config.configurations.chat_provider_config.provider_name = "whatsAppBaileys"
         
         # Add to instances dict
         self.mock_chatbot_instances["session_id_1"] = self.mock_session
 
+    def _set_window_messages(self, messages, start_s=0, end_s=10):
+        """Fetch returns these messages for a (start_s, end_s] window, with nothing tracked before."""
+        self.mock_session.provider_instance.fetch_historic_messages.return_value = messages
+        self.mock_history_service.get_recent_message_ids.side_effect = lambda *args: set()
+        start_dt = datetime.fromtimestamp(start_s, tz=ZoneInfo("UTC"))
+        end_dt = datetime.fromtimestamp(end_s, tz=ZoneInfo("UTC"))
+        self.mock_window_calculator.calculate_window.return_value = (start_dt, end_dt)
+
     async def test_aborts_if_chatbot_not_active(self):
         """Test that the runner aborts if no active session is found for the user."""
         # Clear instances
@@ -65,6 +76,17 @@ class TestGroupTrackingRunner(unittest.IsolatedAsyncioTestCase):
         self.mock_session.provider_instance.fetch_historic_messages.assert_not_called()
         self.mock_window_calculator.calculate_window.assert_not_called()
 
+    async def test_uses_instance_resolver_when_provided(self):
+        """Test that the bot instance comes from the resolver instead of scanning all instances."""
+        resolver = MagicMock(return_value=None)
+        self.runner.instance_resolver = resolver
+
+        await self.runner.run_tracking_cycle(self.bot_id, self.config)
+
+        resolver.assert_called_once_with(self.bot_id)
+        # Resolver knows no active instance -> abort even though the dict contains one
+        self.mock_session.provider_instance.fetch_historic_messages.assert_not_called()
+
     async def test_aborts_if_provider_disconnected(self):
         """Test that the runner aborts if the provider is not connected."""
         self.mock_session.provider_instance.is_connected = False
@@ -76,10 +98,25 @@ class TestGroupTrackingRunner(unittest.IsolatedAsyncioTestCase):
     async def test_aborts_if_fetch_returns_none(self):
         """Test that the runner aborts if fetch_historic_messages returns None (error)."""
         self.mock_session.provider_instance.fetch_historic_messages.return_value = None
+        start_dt = datetime.fromtimestamp(0, tz=ZoneInfo("UTC"))
+        end_dt = datetime.fromtimestamp(10, tz=ZoneInfo("UTC"))
+        self.mock_window_calculator.calculate_window.return_value = (start_dt, end_dt)
         
         await self.runner.run_tracking_cycle(self.bot_id, self.config)
         
-        self.mock_window_calculator.calculate_window.assert_not_called()
+        # Window is computed before the fetch, but state must not be updated
+        self.mock_history_service.save_tracking_result.assert_not_called()
+        self.mock_extractor.extract.assert_not_called()
+
+    async def test_fetch_is_limited_to_window(self):
+        """Test that the calculated window is passed to the provider as a pre-filter."""
+        self._set_window_messages([], start_s=100, end_s=200)
+
+        await self.runner.run_tracking_cycle(self.bot_id, self.config)
+
+        fetch_kwargs = self.mock_session.provider_instance.fetch_historic_messages.call_args[1]
+        self.assertEqual(fetch_kwargs['since_ts_ms'], 100000)
+        self.assertEqual(fetch_kwargs['until_ts_ms'], 200000)
 
     async def test_successful_run_flow(self):
         """Test a complete successful run with messages."""
@@ -104,6 +141,7 @@ class TestGroupTrackingRunner(unittest.IsolatedAsyncioTestCase):
         
         # Run
         await self.runner.run_tracking_cycle(self.bot_id, self.config)
+        await self.runner.wait_for_pending_extractions()
             
         # Verify
         # Should call window calculator
@@ -113,6 +151,9 @@ class TestGroupTrackingRunner(unittest.IsolatedAsyncioTestCase):
         self.mock_history_service.save_tracking_result.assert_called_once()
         saved_messages = self.mock_history_service.save_tracking_result.call_args[1]['messages']
         self.assertEqual(len(saved_messages), 2) # Both messages in window
+        # One ingest timestamp for the whole batch
+        self.assertEqual(saved_messages[0]['accepted_time'], saved_messages[1]['accepted_time'])
+        self.assertIsInstance(saved_messages[0]['accepted_time'], int)
         
         # Should extract
         self.mock_extractor.extract.assert_called_once()
@@ -121,6 +162,172 @@ class TestGroupTrackingRunner(unittest.IsolatedAsyncioTestCase):
         self.mock_queue_manager.add_item.assert_called_once()
         item = self.mock_queue_manager.add_item.call_args[1]['content']
         self.assertEqual(item['task_title'], 'Test Task')
+        self.assertEqual(self.mock_queue_manager.add_item.call_args[1]['provider_name'], 'whatsAppBaileys')
+
+    async def test_extraction_concurrency_is_bounded(self):
+        """Test that concurrent cycles do not run more extractions at once than the semaphore allows."""
+        self.runner._llm_semaphore = asyncio.Semaphore(2)
+        self._set_window_messages([
+            {"provider_message_id": "m1", "originating_time": 1000, "message": "hello", "sender": "alice"}
+        ])
+
+        running = 0
+        peak = 0
+
+        async def yield_to_loop():
+            # asyncio.sleep is patched in this test case
+            future = asyncio.get_running_loop().create_future()
+            asyncio.get_running_loop().call_soon(future.set_result, None)
+            await future
+
+        async def slow_extract(**kwargs):
+            nonlocal running, peak
+            # The extractor holds a slot around each LLM call
+            async with kwargs["llm_slots"]:
+                running += 1
+                peak = max(peak, running)
+                for _ in range(10):
+                    await yield_to_loop()
+                running -= 1
+            return []
+
+        self.mock_extractor.extract.side_effect = slow_extract
+        await asyncio.gather(*[self.runner.run_tracking_cycle(self.bot_id, self.config) for _ in range(5)])
+        await self.runner.wait_for_pending_extractions()
+
+        self.assertEqual(self.mock_extractor.extract.call_count, 5)
+        self.assertEqual(peak, 2)
+
+    async def test_save_runs_concurrently_with_extraction(self):
+        """Test that extraction does not wait for the period write, but items are queued only after it."""
+        self._set_window_messages([
+            {"provider_message_id": "m1", "originating_time": 1000, "message": "hello", "sender": "alice"}
+        ])
+
+        save_released = asyncio.Event()
+        events = []
+
+        async def slow_save(**kwargs):
+            events.append("save_started")
+            await save_released.wait()
+            events.append("save_done")
+
+        async def extract(**kwargs):
+            events.append("extract")
+            save_released.set()
+            return [{"task_title": "Test Task"}]
+
+        self.mock_history_service.save_tracking_result.side_effect = slow_save
+        self.mock_extractor.extract.side_effect = extract
+        self.mock_queue_manager.add_item.side_effect = lambda **kwargs: events.append("queued")
+
+        await self.runner.run_tracking_cycle(self.bot_id, self.config)
+        await self.runner.wait_for_pending_extractions()
+
+        self.assertLess(events.index("extract"), events.index("save_done"))
+        self.assertEqual(events[-2:], ["save_done", "queued"])
+
+    async def test_cycle_returns_before_extraction_finishes(self):
+        """Test that the scheduled cycle completes after the save, while a slow extraction continues detached."""
+        self._set_window_messages([
+            {"provider_message_id": "m1", "originating_time": 1000, "message": "hello", "sender": "alice"}
+        ])
+
+        llm_released = asyncio.Event()
+
+        async def slow_extract(**kwargs):
+            await llm_released.wait()
+            return [{"task_title": "Test Task"}]
+
+        self.mock_extractor.extract.side_effect = slow_extract
+
+        await self.runner.run_tracking_cycle(self.bot_id, self.config)
+        self.mock_history_service.save_tracking_result.assert_awaited_once()
+        self.mock_queue_manager.add_item.assert_not_called()
+
+        llm_released.set()
+        await self.runner.wait_for_pending_extractions()
+        self.mock_queue_manager.add_item.assert_called_once()
+
+    async def test_items_dropped_when_save_fails(self):
+        """Test that action items of a period that failed to persist are not queued."""
+        self._set_window_messages([
+            {"provider_message_id": "m1", "originating_time": 1000, "message": "hello", "sender": "alice"}
+        ])
+        self.mock_history_service.save_tracking_result.side_effect = Exception("write failed")
+        self.mock_extractor.extract.return_value = [{"task_title": "Test Task"}]
+
+        with self.assertRaises(Exception):
+            await self.runner.run_tracking_cycle(self.bot_id, self.config)
+        await self.runner.wait_for_pending_extractions()
+
+        self.mock_queue_manager.add_item.assert_not_called()
+
+    async def test_group_alternate_identifiers_are_merged(self):
+        """Test that group alternate identifiers from all messages end up in the saved set."""
+        group = {"alternate_identifiers": ["group@g.us", "Test Group"]}
+        self._set_window_messages([
+            {"provider_message_id": "m1", "originating_time": 1000, "message": "hi", "sender": "alice", "group": dict(group)},
+            {"provider_message_id": "m2", "originating_time": 2000, "message": "hi", "sender": "bob", "group": dict(group)},
+            {"provider_message_id": "m3", "originating_time": 3000, "message": "hi", "sender": "bob",
+             "group": {"alternate_identifiers": ["Renamed Group"]}},
+            {"provider_message_id": "m4", "originating_time": 4000, "message": "hi", "sender": "bob"},
+        ])
+        self.mock_extractor.extract.return_value = []
+
+        await self.runner.run_tracking_cycle(self.bot_id, self.config)
+
+        saved_set = self.mock_history_service.save_tracking_result.call_args[1]['alternate_identifiers_set']
+        self.assertEqual(saved_set, {"group@g.us", "Test Group", "Renamed Group"})
+
+    async def test_jitter_is_stable_per_group(self):
+        """Test that the start delay is the same on every fire of a group and spread across groups."""
+        from features.periodic_group_tracking.runner import _stable_jitter
+
+        self.mock_session.provider_instance.is_connected = False
+        await self.runner.run_tracking_cycle(self.bot_id, self.config, max_jitter_seconds=5.0)
+        await self.runner.run_tracking_cycle(self.bot_id, self.config, max_jitter_seconds=5.0)
+
+        delays = [call.args[0] for call in self.mock_sleep.call_args_list]
+        self.assertEqual(delays, [_stable_jitter(self.bot_id, self.group_id, 5.0)] * 2)
+        self.assertTrue(0 <= delays[0] < 5.0)
+        self.assertEqual(len({_stable_jitter(self.bot_id, f"g{i}", 5.0) for i in range(20)}), 20)
+
+    async def test_empty_window_skips_fetch(self):
+        """Test that a fire whose window was already processed does not fetch or save anything."""
+        same_dt = datetime.fromtimestamp(10, tz=ZoneInfo("UTC"))
+        self.mock_window_calculator.calculate_window.return_value = (same_dt, same_dt)
+
+        await self.runner.run_tracking_cycle(self.bot_id, self.config)
+
+        self.mock_session.provider_instance.fetch_historic_messages.assert_not_called()
+        self.mock_history_service.save_tracking_result.assert_not_called()
+
+    def test_invalid_timezone_falls_back_to_utc_once(self):
+        """Test that timezones are resolved once and an invalid name is warned about only once."""
+        with self.assertLogs('features.periodic_group_tracking.runner', level='WARNING') as logs:
+            self.assertEqual(self.runner._get_timezone("Not/AZone", self.bot_id), ZoneInfo("UTC"))
+            self.assertEqual(self.runner._get_timezone("Not/AZone", self.bot_id), ZoneInfo("UTC"))
+        self.assertEqual(len(logs.records), 1)
+        self.assertIs(self.runner._get_timezone("Asia/Jerusalem", self.bot_id), self.runner._get_timezone("Asia/Jerusalem", self.bot_id))
+
+    async def test_window_selection_sorted_and_unsorted_input(self):
+        """Test that only messages inside (start, end] are kept, in time order, whatever the fetch order."""
+        self._set_window_messages([], start_s=1, end_s=3)
+        self.mock_extractor.extract.return_value = []
+        sorted_messages = [
+            {"provider_message_id": f"m{ts}", "originating_time": ts, "message": "x"}
+            for ts in (500, 1000, 1500, 2500, 3000, 3500)
+        ]
+
+        for messages in (sorted_messages, list(reversed(sorted_messages))):
+            self.mock_history_service.save_tracking_result.reset_mock()
+            self.mock_session.provider_instance.fetch_historic_messages.return_value = messages
+
+            await self.runner.run_tracking_cycle(self.bot_id, self.config)
+
+            saved = self.mock_history_service.save_tracking_result.call_args[1]['messages']
+            self.assertEqual([m['originating_time'] for m in saved], [1500, 2500, 3000])
 
     async def test_deduplication(self):
         """Test that duplicate messages are filtered out."""
@@ -62,6 +62,7 @@ class TestTrackerDeduplication(unittest.IsolatedAsyncioTestCase):
             }
         ]
         fake_provider.is_bot_message = MagicMock(return_value=False)
+        fake_provider.are_bot_messages = MagicMock(side_effect=lambda ids: [False] * len(ids))
         
         # Config
         config = PeriodicGroupTrackingConfig(